@@ -0,0 +1,234 @@
+"""
+Benchmarks of the RadioactiveEnv step loop
+
+Each case builds a model, runs warm-up steps, then times every step of the
+measured window (Robot.step -> deliberate -> RadioactiveEnv.do, the message
+dispatch and the data collection). Peak memory is measured in a second run
+under tracemalloc, which would otherwise slow the timed run down.
+
+The cases vary one parameter at a time around a base configuration, which
+gives one scaling curve per parameter. message_load is the number of extra
+QUERY_REF messages sent between random robots before every step, the robots
+read them but don't act on them.
+
+Run from the repository root:
+    python -m benchmarks.step_benchmark --output-dir benchmark_results
+    python -m benchmarks.step_benchmark --quick --baseline benchmark_results/results.json
+
+Outputs results.json (every case), scaling.csv (one row per case) and, when
+matplotlib is available, scaling.png. With --baseline the exit code is 1 when
+the steps/sec of a case dropped by more than --tolerance.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import warnings
+
+from robots.agents import Robot
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+from robots.model import RadioactiveEnv
+
+BASE = {
+    'width': 21,
+    'height': 5,
+    'initial_robots_per_zone': 1,
+    'initial_wastes_per_zone': 6,
+    'message_load': 0,
+}
+
+CURVES = {
+    'width': [21, 42, 84, 168],
+    'height': [5, 10, 20, 40],
+    'initial_robots_per_zone': [1, 4, 16, 64],
+    'initial_wastes_per_zone': [6, 24, 96, 384],
+    'message_load': [0, 10, 100, 1000],
+}
+
+QUICK_CURVES = {name: values[:2] for name, values in CURVES.items()}
+
+
+def build_model(case, seed):
+    params = {key: value for key, value in case.items() if key != 'message_load'}
+    return RadioactiveEnv(seed=seed, **params)
+
+
+def send_message_load(model, robots, count, rng):
+    '''
+        Send count messages between random robots, delivered at the next dispatch
+    '''
+    for _ in range(count):
+        sender, receiver = rng.choice(robots), rng.choice(robots)
+        model.message_service.send_message(
+            Message(sender.unique_id, receiver.unique_id, MessagePerformative.QUERY_REF, None))
+
+
+def run_steps(model, steps, message_load, rng, latencies=None):
+    robots = list(model.schedule.get_agents_of_type(Robot))
+    for _ in range(steps):
+        start = time.perf_counter_ns()
+        if message_load:
+            send_message_load(model, robots, message_load, rng)
+        model.step()
+        if latencies is not None:
+            latencies.append(time.perf_counter_ns() - start)
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def benchmark_case(case, steps, warmup, seed=0, memory=True):
+    '''
+        Time steps steps of one configuration after warmup steps
+        Return: dict of the case parameters and its measurements
+    '''
+    result = dict(case)
+    latencies = []
+    model = build_model(case, seed)
+    rng = random.Random(seed)
+    run_steps(model, warmup, case['message_load'], rng)
+    start = time.perf_counter()
+    run_steps(model, steps, case['message_load'], rng, latencies)
+    elapsed = time.perf_counter() - start
+    messages_sent = model.message_service.get_sent_count()
+
+    if memory:
+        tracemalloc.start()
+        model = build_model(case, seed)
+        run_steps(model, warmup + steps, case['message_load'], random.Random(seed))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_memory_bytes'] = peak
+
+    latencies.sort()
+    result.update({
+        'steps': steps,
+        'steps_per_sec': steps / elapsed,
+        'latency_p50_us': percentile(latencies, 0.50) / 1000,
+        'latency_p90_us': percentile(latencies, 0.90) / 1000,
+        'latency_p99_us': percentile(latencies, 0.99) / 1000,
+        'latency_max_us': latencies[-1] / 1000,
+        'messages_sent': messages_sent,
+    })
+    return result
+
+
+def cases(curves):
+    '''
+        One case per value of every curve, the other parameters at their base value
+        Yield: (curve name, case)
+    '''
+    for name, values in curves.items():
+        for value in values:
+            yield name, {**BASE, name: value}
+
+
+def compare(results, baseline, tolerance):
+    '''
+        Return: the descriptions of the cases slower than the baseline by more than tolerance
+    '''
+    def key(result):
+        return (result['curve'],) + tuple(result[name] for name in BASE)
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        change = result['steps_per_sec'] / before['steps_per_sec'] - 1
+        if change < -tolerance:
+            regressions.append(
+                f"{result['curve']}={result[result['curve']]}: "
+                f"{before['steps_per_sec']:.1f} -> {result['steps_per_sec']:.1f} steps/sec ({change:+.0%})")
+    return regressions
+
+
+def plot(results, path):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    figure, axes = plt.subplots(1, len(CURVES), figsize=(4 * len(CURVES), 3.5))
+    for axis, name in zip(axes, CURVES):
+        curve = [result for result in results if result['curve'] == name]
+        if not curve:
+            axis.set_visible(False)
+            continue
+        axis.plot([result[name] for result in curve], [result['steps_per_sec'] for result in curve], marker='o')
+        axis.set_xscale('log')
+        axis.set_yscale('log')
+        axis.set_xlabel(name)
+        axis.set_ylabel('steps/sec')
+    figure.tight_layout()
+    figure.savefig(path)
+    plt.close(figure)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the RadioactiveEnv step loop')
+    parser.add_argument('--steps', type=int, default=200, help='measured steps per case')
+    parser.add_argument('--warmup', type=int, default=20, help='steps run before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='only the first two values of every curve')
+    parser.add_argument('--curves', nargs='+', choices=sorted(CURVES), default=None, help='curves to run, all by default')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--output-dir', default='benchmark_results')
+    parser.add_argument('--baseline', default=None, help='results.json of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed steps/sec drop against the baseline')
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter('ignore')
+    curves = QUICK_CURVES if args.quick else CURVES
+    if args.curves:
+        curves = {name: curves[name] for name in args.curves}
+
+    results = []
+    for name, case in cases(curves):
+        result = benchmark_case(case, args.steps, args.warmup, args.seed, memory=not args.no_memory)
+        result['curve'] = name
+        results.append(result)
+        memory = f", peak {result['peak_memory_bytes'] / 2**20:.1f} MiB" if 'peak_memory_bytes' in result else ''
+        print(f"{name}={case[name]}: {result['steps_per_sec']:.1f} steps/sec, "
+              f"p50 {result['latency_p50_us']:.0f} us, p99 {result['latency_p99_us']:.0f} us{memory}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, 'results.json'), 'w') as output:
+        json.dump({
+            'python': sys.version,
+            'platform': platform.platform(),
+            'steps': args.steps,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'results': results,
+        }, output, indent=2)
+    with open(os.path.join(args.output_dir, 'scaling.csv'), 'w', newline='') as output:
+        fieldnames = ['curve'] + [key for key in results[0] if key != 'curve']
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
+    plot(results, os.path.join(args.output_dir, 'scaling.png'))
+    print(f'{len(results)} cases written to {args.output_dir}')
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print('Regression:', regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,13 @@
 import mesa
 from collections import namedtuple
+import copy
 import random
 
 
 from robots.communication.agent.CommunicatingAgent import CommunicatingAgent
+from .beliefs import WasteBeliefs
+from .versioned_grid import forget_cells
+from .percepts import without_contents
 
 # Helper classes
 class KnowledgeBase():
@@ -14,25 +18,121 @@ class KnowledgeBase():
 
         # Taken from percepts
         self.neighbours = None
+        self.neighbour_cells = ()
+        # Incremental percepts only: whether each cell of the neighbourhood holds a waste of the
+        # robot's colour, forgotten when the cell leaves the neighbourhood
+        self.cells = {}
         self.current_pos = None
         self.waste_list = []
-        self.received_waste_locations= []
+        # Waste locations awarded to the robot, see beliefs.WasteBeliefs
+        self.waste_beliefs = WasteBeliefs()
+        self.waste_here = False
+        self.nearby_waste = None
+
+    def __getstate__(self):
+        # Copies and pickles don't keep the cell contents, see percepts.without_contents
+        state = self.__dict__.copy()
+        state['neighbours'] = without_contents(self.neighbours)
+        return state
+
+# Stand-in for a carried Waste in a detached knowledge base
+WasteView = namedtuple('WasteView', ['unique_id', 'colour'])
+
+
+class StepRandom():
+    """
+    Random stream of a robot for a single step, seeded from the robot seed and the step
+
+    Used by the synchronous step mode, so the draws don't depend on where the
+    deliberation runs. The random.Random is only created on first use, and only
+    the seed is sent to another process.
+    """
+    __slots__ = ('seed', '_random')
+
+    def __init__(self, seed):
+        self.seed = seed
+        self._random = None
+
+    def __reduce__(self):
+        return (StepRandom, (self.seed,))
+
+    def choice(self, seq):
+        if self._random is None:
+            self._random = random.Random(self.seed)
+        return self._random.choice(seq)
+
 
 # Helper Functions
+def agent_seed(model_seed, unique_id):
+    '''
+        Seed of an agent's random stream, derived from the model seed
+        so every agent draws from its own reproducible stream
+    '''
+    return f'{model_seed}/{unique_id}'
+
+def detach(knowledge):
+    '''
+        Copy of the knowledge without references to the model's agents,
+        small enough to be sent to another process for deliberation
+        The cell contents are dropped and the carried wastes are replaced by WasteViews
+    '''
+    # The copy drops the cell contents, see KnowledgeBase.__getstate__
+    detached = copy.copy(knowledge)
+    detached.cells = dict(knowledge.cells)
+    detached.waste_list = [WasteView(waste.unique_id, waste.colour) for waste in knowledge.waste_list]
+    detached.waste_beliefs = knowledge.waste_beliefs.copy()
+    return detached
+
 def update(knowledge, percepts):
     # Add info to the knowledge base
-    knowledge.neighbours = percepts.neighbours
+    knowledge.neighbour_cells = percepts.neighbour_cells
+    if percepts.changed_cells is None:
+        knowledge.neighbours = percepts.neighbours
+    else:
+        # Incremental percepts, merge the cells that changed since the last observation
+        knowledge.neighbours = None
+        cells = knowledge.cells
+        cells.update(percepts.changed_cells)
+        if len(cells) > len(percepts.neighbour_cells):
+            forget_cells(cells, percepts.neighbour_cells)
     knowledge.current_pos = percepts.current_pos
     knowledge.waste_list = percepts.waste_list
-    if percepts.received_waste_location is not None:
-        knowledge.received_waste_locations.append(percepts.received_waste_location)
-    if percepts.pickedup_waste == True:
-        # remove the current pos from the received waste locations
-        if percepts.current_pos in knowledge.received_waste_locations:
-            knowledge.received_waste_locations.remove(percepts.current_pos)
+    if percepts.changed_cells is None:
+        knowledge.waste_here = percepts.waste_here
+        knowledge.nearby_waste = percepts.nearby_waste
+    else:
+        knowledge.waste_here, knowledge.nearby_waste = wastes_in_sight(knowledge)
+    knowledge.waste_beliefs.update(percepts.received_waste_locations)
+    # No waste of the robot's colour where it believes one is: the robot picked it up,
+    # or another robot did, forget the location instead of chasing it
+    knowledge.waste_beliefs.observe(knowledge.current_pos, knowledge.waste_here)
     
     return knowledge
 
+def wastes_in_sight(knowledge: KnowledgeBase):
+    '''
+        Wastes of the robot's colour in its cells, as the model finds them in the waste index
+        for the full percepts: the nearest one is looked for outside the drop off column
+        Return: (waste on the robot's cell, nearest cell with a waste or None)
+    '''
+    x, y = knowledge.current_pos
+    drop_off_x = knowledge.x_range[1] - 1
+    waste_here = False
+    nearest = None
+    cells = knowledge.cells
+    for cell in knowledge.neighbour_cells:
+        # Cells never changed are empty, they were never sent
+        if not cells.get(cell, False):
+            continue
+        if cell == knowledge.current_pos:
+            waste_here = True
+        if cell[0] == drop_off_x:
+            continue
+        key = (max(abs(cell[0] - x), abs(cell[1] - y)), cell)
+        if nearest is None or key < nearest:
+            nearest = key
+    return waste_here, None if nearest is None else nearest[1]
+
 def move_right(knowledge: KnowledgeBase):
     """
     Move right, except if already at the end of the zone
@@ -40,41 +140,51 @@ def move_right(knowledge: KnowledgeBase):
     """
     # Check if the robot is at the right edge of the zone
     if knowledge.current_pos[0] == knowledge.x_range[1]-1:
-        print('Cannot go right, I am already at the right edge of my zone!!')
         return
 
     right_move = (knowledge.current_pos[0]+1, knowledge.current_pos[1])
     
     return right_move
 
-def look_for_waste(knowledge: KnowledgeBase):
+def look_for_waste(knowledge: KnowledgeBase, rng: random.Random):
     '''
         Look in the robot's neighbourhood and move to the waste if found
-        Otherwise move randomly
+        Otherwise head for the nearest waste location the robot believes in,
+        or move randomly, drawing from the robot's random stream rng
         Return: next_move (x,y)
     '''
-    next_move = None
-    for neighbour in knowledge.neighbours:
-        # Neighbour is a tuple (cell_location, cell_contents)
-        cell_location, cell_contents = neighbour
-        for content in cell_contents:
-                if content.__class__.__name__ == 'Waste' and content.colour == knowledge.colour and cell_location[0] != knowledge.x_range[1]-1:
-                    print('I found waste!')
-                    next_move = cell_location
-                    break
+    # Nearest waste of the robot's colour in its neighbourhood, outside its drop off column
+    next_move = knowledge.nearby_waste
     if next_move is None:
-        if len(knowledge.received_waste_locations) > 0:
-            # there is at least one waste to go to
-            target_location = knowledge.received_waste_locations[0]
+        if len(knowledge.waste_beliefs) > 0:
+            # there is at least one waste to go to, head for the nearest one awarded to this robot
+            # Zones are obstacle free bands of columns and the target is in the robot's zone,
+            # so one diagonal step toward it is a shortest path (in moves) that never leaves the zone:
+            # a distance field (BFS) per zone would give the same moves at a higher cost
+            target_location = knowledge.waste_beliefs.nearest(knowledge.current_pos)
             next_move = go_to_target_location(target_location, knowledge.current_pos)
         else : 
-            print('No waste found!')
-            next_move = random.choice(knowledge.neighbours)[0]
+            next_move = rng.choice(knowledge.neighbour_cells)
     
     return next_move
 
 
+def bid(knowledge: KnowledgeBase, current_pos, waste_location):
+    '''
+        Offer for collecting an announced waste, lower is better
+        Robots with fewer wastes to collect win first, then the closest one
+        Return: (number of known waste locations, distance in moves)
+    '''
+    distance = max(abs(waste_location[0] - current_pos[0]), abs(waste_location[1] - current_pos[1]))
+    return (len(knowledge.waste_beliefs), distance)
+
+
 def go_to_target_location(target_location,current_location):
+    '''
+        Greedy step toward target_location, diagonal while both coordinates differ
+        Every move is one king move, so it takes max(|dx|, |dy|) steps, the distance of WasteBeliefs.nearest
+        Return: next_move (x,y)
+    '''
 
     current_x, current_y = current_location
     target_x, target_y = target_location
@@ -94,20 +204,12 @@ def waste_available(knowledge: KnowledgeBase):
         Check if there is a waste at the current position
         Return boolean
     '''
-    waste_here = False
-    for neighbour in knowledge.neighbours:
-        cell_location, cell_contents = neighbour
-        for content in cell_contents:
-                if content.__class__.__name__ == 'Waste' and content.colour == knowledge.colour and cell_location == knowledge.current_pos:
-                    print('Waste available here!')
-                    waste_here = True
-                    break
-    return waste_here
+    return knowledge.waste_here
 
 
-def deliberate(knowledge: KnowledgeBase):
+def deliberate(knowledge: KnowledgeBase, rng: random.Random):
     '''
-        Takes info from the knowledge
+        Takes info from the knowledge, and rng for the random moves
         Returns an action for the environment
         Returns:
         Movement: (x,y)
@@ -134,8 +236,7 @@ def deliberate(knowledge: KnowledgeBase):
             handlewaste = 'PickUp'
         # If waste is not available, move to the waste
         else:
-            print('Red robot looking for waste')
-            movement = look_for_waste(knowledge)
+            movement = look_for_waste(knowledge, rng)
     # Other robots, with transformation
     else:
         # If it has two wastes, transform
@@ -157,7 +258,7 @@ def deliberate(knowledge: KnowledgeBase):
                     handlewaste = 'PickUp'
                 else:
                     # Look for more wastes
-                    movement = look_for_waste(knowledge)
+                    movement = look_for_waste(knowledge, rng)
         # If no waste, look for waste
         else:
             # If waste is available, pick it up
@@ -165,7 +266,7 @@ def deliberate(knowledge: KnowledgeBase):
                 handlewaste = 'PickUp'
             else:
                 # Look for more wastes
-                movement = look_for_waste(knowledge)
+                movement = look_for_waste(knowledge, rng)
 
 
     return movement, handlewaste
@@ -186,28 +287,59 @@ class Robot(CommunicatingAgent):
         # Generally available variables
         self.waste_list = []
         self.percepts = None
+        # Grid version of the cells sent in the incremental percepts, maintained by the model
+        self.cell_versions = {}
         self.x_range = x_range
         self.pos = pos
         self.colour = colour
+        # Own random stream, mesa's Agent.random is the shared model stream
+        self.reset_randomizer()
+
+    def reset_randomizer(self):
+        """
+        Restart the robot's random stream from the current model seed.
+        """
+        self.rng = random.Random(agent_seed(self.model._seed, self.unique_id))
     
             
+    def sense(self):
+        """
+        Update the knowledge with the last percepts.
+        Return: False on the first observation, when there is nothing to deliberate on
+        """
+        if self.percepts is None:
+            self.first_observation = False
+            return False
+        # The profiler is checked first, a disabled one costs no call on this path
+        if self.model.profiler.enabled:
+            with self.model.profiler.phase('update', 'Robot'):
+                self.knowledge = update(self.knowledge, self.percepts)
+        else:
+            self.knowledge = update(self.knowledge, self.percepts)
+        return True
+
     def step(self):
         """
         A model step. 
         """
-        if self.percepts is not None:
+        profiler = self.model.profiler
+        if self.sense():
             # Normal case
-            print('normal')
-            self.knowledge = update(self.knowledge, self.percepts)
-            action = deliberate(self.knowledge)
+            if profiler.enabled:
+                with profiler.phase('deliberate', 'Robot'):
+                    action = deliberate(self.knowledge, self.rng)
+            else:
+                action = deliberate(self.knowledge, self.rng)
             
         else:
             # First observation
             action = (None, None)
-            self.first_observation = False
 
-        self.percepts = self.model.do(self,action)
-        print('percepts: ', self.percepts)
+        if profiler.enabled:
+            with profiler.phase('do', 'Robot'):
+                self.percepts = self.model.do(self,action)
+        else:
+            self.percepts = self.model.do(self,action)
 
 
 class Waste(CommunicatingAgent):
@@ -222,16 +354,3 @@ class Waste(CommunicatingAgent):
 
     def step(self):
         pass
-
-class Grid_Tile(CommunicatingAgent):
-    """
-    Colour baby!
-    """
-    def __init__(self, unique_id, pos, model, colour='yellow'):
-        super().__init__(unique_id, model,'tile')
-        self.colour = colour
-        
-        pass
-
-    def step(self):
-        pass
\ No newline at end of file
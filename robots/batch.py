@@ -0,0 +1,134 @@
+"""
+Headless batch runs of the RadioactiveEnv
+
+run_single runs one model to completion (or to the step budget) and returns its
+summary metrics; sweep fans a parameter grid out over a process pool.
+
+Example:
+>>> runs = parameter_grid(width=[21, 42], initial_robots_per_zone=[1, 2, 4], seed=range(100))
+>>> results = sweep(runs, step_count=2000)
+"""
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .cache import ResultCache
+from .model import RadioactiveEnv
+from .vectorized import VectorizedRadioactiveEnv
+
+# Engines selectable by name in run_single and sweep
+ENGINES = {
+    'agents': RadioactiveEnv,
+    'vectorized': VectorizedRadioactiveEnv,
+}
+
+
+def parameter_grid(**values):
+    '''
+        Cartesian product of the given parameter values
+        Scalars are treated as a single value
+        Return: list of keyword dicts for RadioactiveEnv
+    '''
+    keys = list(values)
+    choices = []
+    for key in keys:
+        value = values[key]
+        if isinstance(value, (str, bytes)) or not hasattr(value, '__iter__'):
+            value = [value]
+        choices.append(list(value))
+    return [dict(zip(keys, combination)) for combination in itertools.product(*choices)]
+
+
+def run_single(params, step_count=1000, engine='agents'):
+    '''
+        Build a model from params, run it headless and return params merged with its metrics
+        engine: 'agents' (RadioactiveEnv) or 'vectorized' (VectorizedRadioactiveEnv)
+    '''
+    model = ENGINES[engine](**params)
+    metrics = model.run_model(step_count)
+    if hasattr(model, 'close'):
+        model.close()
+    return {**params, **metrics}
+
+
+def sweep(runs, step_count=1000, processes=None, chunksize=None, engine='agents', cache=None):
+    '''
+        Run every parameter dict of runs in a process pool using all cores by default
+        Results are returned in the same order as runs
+        cache: ResultCache, the cached runs are not simulated again and the new ones are added
+    '''
+    runs = list(runs)
+    results = [None] * len(runs)
+    if cache is not None:
+        for i, params in enumerate(runs):
+            results[i] = cache.get(params, step_count, engine)
+    missing = [i for i, result in enumerate(results) if result is None]
+    todo = [runs[i] for i in missing]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(todo) <= 1:
+        computed = [run_single(params, step_count, engine=engine) for params in todo]
+    else:
+        if chunksize is None:
+            # Several runs per task keep the pool overhead low for thousands of replicates
+            chunksize = max(1, len(todo) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            computed = list(executor.map(partial(run_single, step_count=step_count, engine=engine), todo, chunksize=chunksize))
+
+    for i, result in zip(missing, computed):
+        results[i] = result
+        if cache is not None:
+            cache.put(runs[i], step_count, engine, result)
+    return results
+
+
+def flatten(result):
+    '''
+        Flatten the per colour waste counts of a result for tabular output
+    '''
+    row = {key: value for key, value in result.items() if key not in ('waste_remaining', 'waste_stranded')}
+    for key in ('waste_remaining', 'waste_stranded'):
+        for colour, count in result[key].items():
+            row[f'{key}_{colour}'] = count
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless parameter sweep of the RadioactiveEnv')
+    parser.add_argument('--width', type=int, nargs='+', default=[21])
+    parser.add_argument('--height', type=int, nargs='+', default=[5])
+    parser.add_argument('--wastes', type=int, nargs='+', default=[6], help='initial_wastes_per_zone values')
+    parser.add_argument('--robots', type=int, nargs='+', default=[1], help='initial_robots_per_zone values')
+    parser.add_argument('--seeds', type=int, default=10, help='number of replicate seeds per combination')
+    parser.add_argument('--steps', type=int, default=1000, help='step budget per run')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='agents')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--cache', default=None, help='directory of the result cache, no cache by default')
+    args = parser.parse_args(argv)
+
+    runs = parameter_grid(
+        width=args.width,
+        height=args.height,
+        initial_wastes_per_zone=args.wastes,
+        initial_robots_per_zone=args.robots,
+        seed=range(args.seeds),
+    )
+    cache = ResultCache(args.cache) if args.cache else None
+    rows = [flatten(result) for result in sweep(runs, args.steps, args.processes, engine=args.engine, cache=cache)]
+    if not rows:
+        # e.g. --seeds 0, there is no column to write a header with
+        print(f'No runs, {args.output} not written')
+        return
+    with open(args.output, 'w', newline='') as output:
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f'{len(rows)} runs written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Beliefs of a robot about the waste locations it was awarded
+
+WasteBeliefs replaces the plain list of received waste locations:
+    - a location is held once, however many messages named it
+    - locations are bucketed on a coarse grid, so the nearest one is found by
+      looking at the buckets around the robot instead of every location
+    - the robot's percepts evict the locations found without a waste of its
+      colour (taken by another robot), so it doesn't keep chasing them
+"""
+
+# Up to this many locations, nearest() compares them all instead of walking the buckets
+LINEAR_SCAN = 32
+
+
+def distance(a, b):
+    '''
+        Number of moves between two cells, robots move in the 8 directions
+    '''
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+
+class WasteBeliefs():
+    """
+        Set of believed waste locations, bucketed for nearest queries
+    """
+    def __init__(self, locations=(), bucket_size=8):
+        self.bucket_size = bucket_size
+        self.locations = set()
+        # (x // bucket_size, y // bucket_size) -> set of locations
+        self.buckets = {}
+        # Number of locations evicted as stale
+        self.evicted = 0
+        self.update(locations)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __contains__(self, location):
+        return location in self.locations
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def _bucket(self, location):
+        return (location[0] // self.bucket_size, location[1] // self.bucket_size)
+
+    def add(self, location):
+        '''
+            Return: True if the location was not believed yet
+        '''
+        if location in self.locations:
+            return False
+        self.locations.add(location)
+        self.buckets.setdefault(self._bucket(location), set()).add(location)
+        return True
+
+    def update(self, locations):
+        for location in locations:
+            self.add(location)
+
+    def discard(self, location):
+        '''
+            Return: True if the location was believed
+        '''
+        if location not in self.locations:
+            return False
+        self.locations.remove(location)
+        key = self._bucket(location)
+        bucket = self.buckets[key]
+        bucket.remove(location)
+        if len(bucket) == 0:
+            del self.buckets[key]
+        return True
+
+    def observe(self, pos, waste_here):
+        '''
+            Percept driven eviction: the robot is at pos and sees whether a waste of its colour is there
+            A believed location found without waste is stale, it is dropped
+            Return: True if pos was evicted
+        '''
+        if waste_here or not self.discard(pos):
+            return False
+        self.evicted += 1
+        return True
+
+    def nearest(self, pos):
+        '''
+            Return: the believed location closest to pos (ties broken on the location), None if there is none
+        '''
+        if len(self.locations) <= LINEAR_SCAN:
+            if not self.locations:
+                return None
+            return min(self.locations, key=lambda location: (distance(pos, location), location))
+        size = self.bucket_size
+        bx, by = self._bucket(pos)
+        best = None
+        seen = 0
+        ring = 0
+        while seen < len(self.locations):
+            # Buckets at Chebyshev distance ring from the robot's bucket
+            for x in range(bx - ring, bx + ring + 1):
+                for y in range(by - ring, by + ring + 1):
+                    if ring and bx - ring < x < bx + ring and by - ring < y < by + ring:
+                        continue
+                    bucket = self.buckets.get((x, y))
+                    if bucket is None:
+                        continue
+                    seen += len(bucket)
+                    for location in bucket:
+                        key = (distance(pos, location), location)
+                        if best is None or key < best:
+                            best = key
+            # Locations in the next ring are at least ring * size + 1 moves away
+            if best is not None and best[0] <= ring * size:
+                break
+            ring += 1
+        return best[1]
+
+    def copy(self):
+        beliefs = WasteBeliefs(bucket_size=self.bucket_size)
+        beliefs.locations = set(self.locations)
+        beliefs.buckets = {key: set(bucket) for key, bucket in self.buckets.items()}
+        beliefs.evicted = self.evicted
+        return beliefs
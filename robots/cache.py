@@ -0,0 +1,85 @@
+"""
+On disk cache of run results
+
+A result is stored under the hash of its parameters (seed included), step
+budget, engine and the code version, the hash of every source file of the
+robots package. Editing the model therefore invalidates the cache on its own.
+
+Runs without a seed are not reproducible and are never cached.
+
+Example:
+>>> cache = ResultCache('.sweep_cache')
+>>> results = sweep(runs, step_count=2000, cache=cache)
+"""
+import hashlib
+import json
+import os
+
+_code_version = None
+
+
+def code_version():
+    '''
+        Return: hash of the source files of the robots package
+    '''
+    global _code_version
+    if _code_version is None:
+        package = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for directory, subdirectories, files in os.walk(package):
+            subdirectories.sort()
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(directory, name)
+                    digest.update(os.path.relpath(path, package).encode())
+                    with open(path, 'rb') as source:
+                        digest.update(source.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+class ResultCache():
+    """
+        Run results stored as one JSON file per run in directory
+    """
+    def __init__(self, directory, version=None):
+        '''
+            version: code version the results belong to, the package hash by default
+        '''
+        self.directory = directory
+        self.version = version or code_version()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, params, step_count, engine):
+        '''
+            Return: the cache key of a run, None if the run is not reproducible
+        '''
+        if params.get('seed') is None:
+            return None
+        description = json.dumps(
+            {'params': params, 'step_count': step_count, 'engine': engine, 'version': self.version},
+            sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, params, step_count, engine):
+        '''
+            Return: the cached result of the run, or None
+        '''
+        key = self.key(params, step_count, engine)
+        if key is None or not os.path.exists(self._path(key)):
+            return None
+        with open(self._path(key)) as cached:
+            return json.load(cached)
+
+    def put(self, params, step_count, engine, result):
+        key = self.key(params, step_count, engine)
+        if key is None:
+            return
+        # Write then rename, so that concurrent sweeps never read a partial file
+        temporary_path = f'{self._path(key)}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as output:
+            json.dump(result, output)
+        os.replace(temporary_path, self._path(key))
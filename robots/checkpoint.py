@@ -0,0 +1,91 @@
+"""
+Checkpoints of a running model
+
+A snapshot is the zlib compressed pickle of the whole model: the grid, the
+schedule order, the robots' knowledge and inventories, the messages waiting in
+the MessageService and the random number generator state. It works for both
+RadioactiveEnv and VectorizedRadioactiveEnv.
+
+The cell contents of the robots' percepts and knowledge are not saved (see
+percepts.without_contents), the robots don't read them, and keeping them would
+make pickle follow the robots from one percept to the next, as deep as there are
+robots.
+
+Example, warm up once and try variants from there:
+>>> model = RadioactiveEnv(seed=0)
+>>> model.run_model(5000)
+>>> warm = snapshot(model)
+>>> results = [variant.run_model(1000) for variant in fork(warm, 8)]
+"""
+import pickle
+import zlib
+
+
+def snapshot(model, level=6):
+    '''
+        Return: the compressed state of the model, as bytes
+    '''
+    # Write the buffered metrics first, the snapshot must not replay them, and
+    # remember where the streamed files end
+    if getattr(model, 'metrics_stream', None) is not None:
+        model.metrics_stream.checkpoint()
+    return zlib.compress(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL), level)
+
+
+def _loads(data):
+    return pickle.loads(zlib.decompress(data))
+
+
+def restore(data):
+    '''
+        Return: a new model in the state captured by snapshot
+        A streamed model resumes its metrics and trace files where they were at the snapshot,
+        the rows and events written after it (e.g. by an interrupted run) are dropped
+    '''
+    model = _loads(data)
+    if getattr(model, 'metrics_stream', None) is not None:
+        model.metrics_stream.resume()
+    if getattr(model, 'trace', None) is not None:
+        model.trace.resume()
+    return model
+
+
+def save(model, path, level=6):
+    '''
+        Write a snapshot of the model to path
+    '''
+    data = snapshot(model, level)
+    with open(path, 'wb') as output:
+        output.write(data)
+
+
+def load(path):
+    '''
+        Return: the model saved at path
+    '''
+    with open(path, 'rb') as input_file:
+        return restore(input_file.read())
+
+
+def fork(data, n, seeds=None):
+    '''
+        Create n independent models from one snapshot (or model)
+        seeds: one seed per fork, None keeps the random state of the snapshot
+            so every fork continues exactly like the original would
+        Forks don't stream their metrics nor spill their trace, they would all write to the same files,
+        set a new StreamingCollector as metrics_stream (or a new trace.path) to stream them.
+        Yield: the models
+    '''
+    if not isinstance(data, bytes):
+        data = snapshot(data)
+    if seeds is not None and len(seeds) != n:
+        raise ValueError("One seed per fork is needed")
+    for i in range(n):
+        model = _loads(data)
+        if hasattr(model, 'metrics_stream'):
+            model.metrics_stream = None
+        if getattr(model, 'trace', None) is not None:
+            model.trace.path = None
+        if seeds is not None:
+            model.reset_randomizer(seeds[i])
+        yield model
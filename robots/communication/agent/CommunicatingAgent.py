@@ -3,7 +3,9 @@
 from mesa import Agent
 
 from robots.communication.mailbox.Mailbox import Mailbox
-from robots.communication.message.MessageService import MessageService
+
+# Read by the agents that never received a message, it stays empty
+EMPTY_MAILBOX = Mailbox()
 
 
 class CommunicatingAgent(Agent):
@@ -15,53 +17,110 @@ class CommunicatingAgent(Agent):
 
     attr:
         name: The name of the agent (str)
-        mailbox: The mailbox of the agent (Mailbox)
+        mailbox: The mailbox of the agent, None until the first message is received (Mailbox)
         message_service: The message service used to send and receive message (MessageService)
     """
 
-    def __init__(self, unique_id, model, name):
+    def __init__(self, unique_id, model, name, message_service=None, mailbox=None):
         """ Create a new communicating agent.
+        The message service defaults to the one of the model (model.message_service).
+        The mailbox defaults to one following the retention policy of the model
+        (model.mailbox_max_messages and model.mailbox_max_age, no limit if absent), built
+        when the first message is received: most agents (e.g. the wastes) never get one.
         """
         super().__init__(unique_id, model)
         self.__name = name
-        self.__mailbox = Mailbox()
-        self.__messages_service = MessageService.get_instance()
+        self.__mailbox = mailbox
+        if mailbox is not None:
+            mailbox.set_unread_listener(self.unread_changed)
+        if message_service is None:
+            message_service = model.message_service
+        self.__messages_service = message_service
 
     def step(self):
         """ The step methods of the agent called by the scheduler at each time tick.
         """
         super().step()
 
+    def __create_mailbox(self):
+        """ Build the default mailbox, on the first message received.
+        """
+        self.__mailbox = Mailbox(
+            max_messages=getattr(self.model, "mailbox_max_messages", None),
+            max_age=getattr(self.model, "mailbox_max_age", None),
+            clock=self.get_current_step,
+        )
+        self.__mailbox.set_unread_listener(self.unread_changed)
+        return self.__mailbox
+
+    def __read_mailbox(self):
+        """ Return the mailbox to read from, the empty one if no message was received.
+        """
+        return self.__mailbox if self.__mailbox is not None else EMPTY_MAILBOX
+
+    def get_current_step(self):
+        """ Return the current step of the model (clock of the mailbox).
+        """
+        return self.model.schedule.steps
+
     def get_name(self):
         """ Return the name of the communicating agent."""
         return self.__name
 
+    def unread_changed(self, change):
+        """ Report a change of the number of unread messages to the message service (called by the mailbox).
+        """
+        self.__messages_service.unread_changed(self, change)
+
     def receive_message(self, message):
         """ Receive a message (called by the MessageService object) and store it in the mailbox.
         """
-        self.__mailbox.receive_messages(message)
+        mailbox = self.__mailbox if self.__mailbox is not None else self.__create_mailbox()
+        mailbox.receive_messages(message)
 
     def send_message(self, message):
         """ Send message through the MessageService object.
         """
         self.__messages_service.send_message(message)
 
+    def get_unread_count(self):
+        """ Return the number of unread messages in the mailbox.
+        """
+        return self.__read_mailbox().get_unread_count()
+
+    def get_mailbox_statistics(self):
+        """ Return the message counters of the mailbox, see Mailbox.get_statistics.
+        """
+        return self.__read_mailbox().get_statistics()
+
     def get_new_messages(self):
         """ Return all the unread messages.
         """
+        if self.__mailbox is None:
+            return []
         return self.__mailbox.get_new_messages()
 
     def get_messages(self):
         """ Return all the received messages.
         """
-        return self.__mailbox.get_messages()
+        return self.__read_mailbox().get_messages()
+
+    def iter_messages_from_performative(self, performative):
+        """ Iterate without copy over the messages which have the same performative.
+        """
+        return self.__read_mailbox().iter_messages_from_performative(performative)
+
+    def iter_messages_from_exp(self, exp):
+        """ Iterate without copy over the messages which have the same sender.
+        """
+        return self.__read_mailbox().iter_messages_from_exp(exp)
 
     def get_messages_from_performative(self, performative):
         """ Return a list of messages which have the same performative.
         """
-        return self.__mailbox.get_messages_from_performative(performative)
+        return self.__read_mailbox().get_messages_from_performative(performative)
 
     def get_messages_from_exp(self, exp):
         """ Return a list of messages which have the same sender.
         """
-        return self.__mailbox.get_messages_from_exp(exp)
+        return self.__read_mailbox().get_messages_from_exp(exp)
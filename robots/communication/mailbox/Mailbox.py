@@ -1,58 +1,187 @@
 #!/usr/bin/env python3
 
+from collections import Counter, deque
+
 
 class Mailbox:
     """Mailbox class.
     Class implementing the mailbox object which manages messages in communicating agents.
 
+    Read messages are kept according to a retention policy (maximum count and/or maximum
+    age in steps) and indexed by performative and by sender. The iter_* queries walk the
+    stored messages without copying them.
+
+    The mailbox counts the messages received, read and evicted, and, with a clock, how many
+    steps each message waited unread (age at read), see get_statistics.
+
     attr:
         unread_messages: The list of unread messages
-        read_messages: The list of read messages
+        read_messages: The read messages, oldest first, as (step received, message) entries
+        read_by_performative: The read message entries by performative
+        read_by_exp: The read message entries by sender
+        max_messages: The maximum number of read messages kept, None for no limit
+        max_age: The maximum number of steps a read message is kept, None for no limit
+        clock: Callable returning the current step, needed for max_age
+        unread_arrivals: The [step received, count] runs of the unread messages, oldest first
+        received_count: The number of messages received (int)
+        read_count: The number of messages read (int)
+        evicted_count: The number of read messages dropped by the retention policy (int)
+        age_at_read: The number of messages read by number of steps waited unread (Counter)
+        unread_listener: Callable given the change of the number of unread messages, or None
      """
 
-    def __init__(self):
+    def __init__(self, max_messages=None, max_age=None, clock=None):
         """ Create a new Mailbox.
         """
+        if max_age is not None and clock is None:
+            raise ValueError("A clock is needed to expire messages by age")
         self.__unread_messages = []
-        self.__read_messages = []
+        self.__read_messages = deque()
+        self.__read_by_performative = {}
+        self.__read_by_exp = {}
+        self.__max_messages = max_messages
+        self.__max_age = max_age
+        self.__clock = clock
+        self.__unread_arrivals = []
+        self.__received_count = 0
+        self.__read_count = 0
+        self.__evicted_count = 0
+        self.__age_at_read = Counter()
+        self.__unread_listener = None
+
+    def set_unread_listener(self, listener):
+        """ Call listener(change) whenever the number of unread messages changes, None to stop.
+        It lets a MessageService keep its unread count without visiting every mailbox.
+        """
+        self.__unread_listener = listener
+
+    def __now(self):
+        return self.__clock() if self.__clock is not None else None
+
+    def __evict(self):
+        """ Drop the oldest read messages exceeding the retention policy.
+        Entries are added in order, so the evicted entry is at the front of its indexes.
+        """
+        read_messages = self.__read_messages
+        oldest_kept = None
+        if self.__max_age is not None:
+            oldest_kept = self.__now() - self.__max_age
+        while read_messages and (
+            (self.__max_messages is not None and len(read_messages) > self.__max_messages)
+            or (oldest_kept is not None and read_messages[0][0] < oldest_kept)
+        ):
+            entry = read_messages.popleft()
+            self.__evicted_count += 1
+            message = entry[1]
+            self.__drop_from_index(self.__read_by_performative, message.get_performative(), entry)
+            self.__drop_from_index(self.__read_by_exp, message.get_exp(), entry)
+
+    @staticmethod
+    def __drop_from_index(index, key, entry):
+        entries = index[key]
+        entries.popleft()
+        if not entries:
+            del index[key]
 
     def receive_messages(self, message):
         """ Receive a message and add it in the unread messages list.
         """
         self.__unread_messages.append(message)
+        self.__received_count += 1
+        if self.__unread_listener is not None:
+            self.__unread_listener(1)
+        now = self.__now()
+        arrivals = self.__unread_arrivals
+        if arrivals and arrivals[-1][0] == now:
+            arrivals[-1][1] += 1
+        else:
+            arrivals.append([now, 1])
 
     def get_new_messages(self):
         """ Return all the messages from unread messages list.
         """
-        unread_messages = self.__unread_messages.copy()
-        if len(unread_messages) > 0:
-            for messages in unread_messages:
-                self.__read_messages.append(messages)
-
-        self.__unread_messages.clear()
+        unread_messages = self.__unread_messages
+        if len(unread_messages) == 0:
+            return unread_messages
+        self.__unread_messages = []
+        now = self.__now()
+        self.__read_count += len(unread_messages)
+        if self.__unread_listener is not None:
+            self.__unread_listener(-len(unread_messages))
+        messages = iter(unread_messages)
+        for received, count in self.__unread_arrivals:
+            if now is not None:
+                self.__age_at_read[now - received] += count
+            # The entries keep the step the messages were received at, their age counts from it
+            for _ in range(count):
+                message = next(messages)
+                entry = (received, message)
+                self.__read_messages.append(entry)
+                self.__read_by_performative.setdefault(message.get_performative(), deque()).append(entry)
+                self.__read_by_exp.setdefault(message.get_exp(), deque()).append(entry)
+        self.__unread_arrivals = []
+        self.__evict()
         return unread_messages
 
+    def get_unread_count(self):
+        """ Return the number of unread messages.
+        """
+        return len(self.__unread_messages)
+
+    def get_statistics(self):
+        """ Return the message counters of the mailbox.
+        age_at_read maps a number of steps to the number of messages read after waiting that long.
+        """
+        return {
+            "received": self.__received_count,
+            "read": self.__read_count,
+            "unread": len(self.__unread_messages),
+            "evicted": self.__evicted_count,
+            "age_at_read": dict(self.__age_at_read),
+        }
+
+    def iter_messages(self):
+        """ Iterate over the kept read messages, oldest first.
+        """
+        if self.__max_age is not None:
+            self.__evict()
+        return (message for _, message in self.__read_messages)
+
+    def iter_messages_from_performative(self, performative):
+        """ Iterate over the unread then kept read messages which have the same performative.
+        """
+        if self.__max_age is not None:
+            self.__evict()
+        for message in self.__unread_messages:
+            if message.get_performative() == performative:
+                yield message
+        for _, message in self.__read_by_performative.get(performative, ()):
+            yield message
+
+    def iter_messages_from_exp(self, exp):
+        """ Iterate over the unread then kept read messages which have the same sender.
+        """
+        if self.__max_age is not None:
+            self.__evict()
+        for message in self.__unread_messages:
+            if message.get_exp() == exp:
+                yield message
+        for _, message in self.__read_by_exp.get(exp, ()):
+            yield message
+
     def get_messages(self):
         """ Return all the messages from both unread and read messages list.
         """
         if len(self.__unread_messages) > 0:
             self.get_new_messages()
-        return self.__read_messages
+        return list(self.iter_messages())
 
     def get_messages_from_performative(self, performative):
         """ Return a list of messages which have the same performative.
         """
-        messages_from_performative = []
-        for message in self.__unread_messages + self.__read_messages:
-            if message.get_performative() == performative:
-                messages_from_performative.append(message)
-        return messages_from_performative
+        return list(self.iter_messages_from_performative(performative))
 
     def get_messages_from_exp(self, exp):
         """ Return a list of messages which have the same sender.
         """
-        messages_from_exp = []
-        for message in self.__unread_messages + self.__read_messages:
-            if message.get_exp() == exp:
-                messages_from_exp.append(message)
-        return messages_from_exp
+        return list(self.iter_messages_from_exp(exp))
@@ -11,15 +11,37 @@ class Message:
         to_agent: the receiver of the message (id)
         message_performative: the performative of the message
         content: the content of the message
+
+    Messages are immutable (assigning or deleting an attribute raises AttributeError), so one
+    message can be shared by all the receivers of a topic. The content itself should be an
+    immutable value as well, e.g. a tuple.
      """
 
+    __slots__ = ("_Message__from_agent", "_Message__to_agent", "_Message__message_performative", "_Message__content")
+
     def __init__(self, from_agent, to_agent, message_performative, content):
         """ Create a new message.
         """
-        self.__from_agent = from_agent
-        self.__to_agent = to_agent
-        self.__message_performative = message_performative
-        self.__content = content
+        set_attribute = object.__setattr__
+        set_attribute(self, "_Message__from_agent", from_agent)
+        set_attribute(self, "_Message__to_agent", to_agent)
+        set_attribute(self, "_Message__message_performative", message_performative)
+        set_attribute(self, "_Message__content", content)
+
+    def __setattr__(self, name, value):
+        """ Refuse any assignment, the message may be shared by several receivers.
+        """
+        raise AttributeError("Message objects are immutable")
+
+    def __delattr__(self, name):
+        """ Refuse any deletion, the message may be shared by several receivers.
+        """
+        raise AttributeError("Message objects are immutable")
+
+    def __reduce__(self):
+        """ Pickle the message through its constructor, the attributes can't be set afterwards.
+        """
+        return (Message, (self.__from_agent, self.__to_agent, self.__message_performative, self.__content))
 
     def __str__(self):
         """ Return Message as a String.
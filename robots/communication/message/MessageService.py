@@ -1,34 +1,117 @@
 #!/usr/bin/env python3
 
+from collections import Counter
+
+from robots.communication.transport.InMemoryTransport import InMemoryTransport
+
+
 class MessageService:
     """MessageService class.
     Class implementing the message service used to dispatch messages between communicating agents.
 
-    Not intended to be created more than once: it's a singleton.
+    One instance per model: it is created by the model and injected into its agents, so
+    several models can run in the same process without sharing message routing.
 
     attr:
         scheduler: the scheduler of the sma (Scheduler)
-        messages_to_proceed: the list of message to proceed mailbox of the agent (list)
-    """
+        transport: carries the messages between the steps (Transport)
+        sent_count: the number of messages sent through the service (int)
+        delivered_count: the number of messages delivered to a mailbox, once per receiver (int)
+        dropped_count: the number of messages sent to a topic without subscribers, not counted
+            with a shared transport, whose other services may have some (int)
+        sent_by_performative: the number of messages sent by performative (Counter)
+        sent_by_exp: the number of messages sent by sender (Counter)
+        pending_sends: the [step sent, count] runs of the messages waiting in the transport (list)
+        latency: the number of messages dispatched by number of steps waited in the transport (Counter)
+        agents_by_name: index from agent name to the agents sharing that name (dict)
+        agents_by_id: index from agent unique_id to agent (dict)
+        topics: the subscribers of each topic, by unique_id (dict)
+        unread_count: the number of messages in the mailboxes of the indexed agents, not read yet (int)
 
-    __instance = None
+    A message whose receiver is a topic (e.g. "robots:red") is queued once and the same
+    message object is delivered to every subscriber of the topic.
 
-    @staticmethod
-    def get_instance():
-        """ Static access method.
-        """
-        return MessageService.__instance
+    Without instant delivery the messages go through the transport, batched per step: the
+    default InMemoryTransport keeps them in the process, a QueueTransport or SocketTransport
+    lets agents of several processes talk to each other without any change to the agents.
+
+    The steps are read from the scheduler (scheduler.steps). get_statistics returns the
+    counters and histograms of the service and of the mailboxes of its agents.
+    """
 
-    def __init__(self, scheduler, instant_delivery=True):
+    def __init__(self, scheduler, instant_delivery=True, transport=None):
         """ Create a new MessageService object.
         """
-        # if MessageService.__instance is not None:
-        #     raise Exception("This class is a singleton!")
-        # else:
-        MessageService.__instance = self
         self.__scheduler = scheduler
         self.__instant_delivery = instant_delivery
-        self.__messages_to_proceed = []
+        self.__transport = transport if transport is not None else InMemoryTransport()
+        self.__sent_count = 0
+        self.__delivered_count = 0
+        self.__dropped_count = 0
+        self.__sent_by_performative = Counter()
+        self.__sent_by_exp = Counter()
+        self.__pending_sends = []
+        self.__latency = Counter()
+        self.__agents_by_name = {}
+        self.__agents_by_id = {}
+        self.__topics = {}
+        self.__unread_count = 0
+        # The index can only be trusted if the scheduler reports additions and removals
+        self.__indexed = hasattr(scheduler, "add_observer")
+        if self.__indexed:
+            for agent in scheduler.agents:
+                self.agent_added(agent)
+            scheduler.add_observer(self)
+
+    def agent_added(self, agent):
+        """ Index an agent added to the scheduler (called by the scheduler).
+        """
+        self.__agents_by_id[agent.unique_id] = agent
+        self.__agents_by_name.setdefault(agent.get_name(), {})[agent.unique_id] = agent
+        if hasattr(agent, "get_unread_count"):
+            self.__unread_count += agent.get_unread_count()
+
+    def agent_removed(self, agent):
+        """ Drop an agent removed from the scheduler from the index (called by the scheduler).
+        """
+        if self.__agents_by_id.pop(agent.unique_id, None) is agent and hasattr(agent, "get_unread_count"):
+            self.__unread_count -= agent.get_unread_count()
+        group = self.__agents_by_name.get(agent.get_name())
+        if group is not None:
+            group.pop(agent.unique_id, None)
+            if len(group) == 0:
+                del self.__agents_by_name[agent.get_name()]
+        for subscribers in self.__topics.values():
+            subscribers.pop(agent.unique_id, None)
+
+    def unread_changed(self, agent, change):
+        """ Update the unread count when the mailbox of an agent changes (called by the agent).
+        Agents not indexed are counted when they are added.
+        """
+        if self.__agents_by_id.get(agent.unique_id) is agent:
+            self.__unread_count += change
+
+    def add_topic(self, topic):
+        """ Declare a topic, the messages sent to it while it has no subscriber are dropped.
+        """
+        self.__topics.setdefault(topic, {})
+
+    def subscribe(self, topic, agent):
+        """ Subscribe an agent to the messages sent to a topic.
+        """
+        self.__topics.setdefault(topic, {})[agent.unique_id] = agent
+
+    def unsubscribe(self, topic, agent):
+        """ Stop delivering the messages of a topic to an agent.
+        """
+        subscribers = self.__topics.get(topic)
+        if subscribers is not None:
+            subscribers.pop(agent.unique_id, None)
+
+    def get_subscribers(self, topic):
+        """ Return the agents subscribed to a topic.
+        """
+        return list(self.__topics.get(topic, {}).values())
 
     def set_instant_delivery(self, instant_delivery):
         """ Set the instant delivery parameter.
@@ -36,30 +119,170 @@ class MessageService:
         self.__instant_delivery = instant_delivery
 
     def send_message(self, message):
-        """ Dispatch message if instant delivery active, otherwise add the message to proceed list.
+        """ Dispatch message if instant delivery active, otherwise hand the message to the transport.
         """
+        self.__sent_count += 1
+        self.__sent_by_performative[message.get_performative()] += 1
+        self.__sent_by_exp[message.get_exp()] += 1
         if self.__instant_delivery:
+            self.__latency[0] += 1
             self.dispatch_message(message)
         else:
-            self.__messages_to_proceed.append(message)
+            self.__transport.send(message)
+            now = self.__now()
+            pending_sends = self.__pending_sends
+            if pending_sends and pending_sends[-1][0] == now:
+                pending_sends[-1][1] += 1
+            else:
+                pending_sends.append([now, 1])
+
+    def get_pending_messages(self):
+        """ Return the messages sent through this service and waiting for the next dispatch.
+        """
+        return self.__transport.get_pending_messages()
+
+    def get_transport(self):
+        """ Return the transport of the service.
+        """
+        return self.__transport
+
+    def set_transport(self, transport):
+        """ Replace the transport of the service, before any message is sent through it.
+        """
+        if self.__transport.get_pending_count() > 0:
+            raise ValueError("The transport can't be replaced while messages are pending")
+        self.__transport = transport
+
+    def close(self):
+        """ Close the transport of the service.
+        """
+        self.__transport.close()
+
+    def get_sent_count(self):
+        """ Return the number of messages sent through the service.
+        """
+        return self.__sent_count
+
+    def get_delivered_count(self):
+        """ Return the number of messages delivered, a topic message counts once per subscriber.
+        """
+        return self.__delivered_count
+
+    def get_dropped_count(self):
+        """ Return the number of messages sent to a topic without subscribers (not counted with a shared transport).
+        """
+        return self.__dropped_count
+
+    def get_in_flight_count(self):
+        """ Return the number of messages waiting for the next dispatch.
+        """
+        return self.__transport.get_pending_count()
+
+    def get_unread_count(self):
+        """ Return the number of messages delivered to the agents and not read yet.
+        The count is kept up to date by the agents, unless the scheduler doesn't report additions and removals.
+        """
+        if self.__indexed:
+            return self.__unread_count
+        return sum(agent.get_unread_count() for agent in self.__communicating_agents())
+
+    def get_statistics(self):
+        """ Return a snapshot of the message counters and histograms, as a JSON serialisable dict.
+        latency and age_at_read map a number of steps waited (in the transport, in the mailbox)
+        to a number of messages. The mailbox counters are summed over the agents.
+        """
+        mailboxes = {"received": 0, "read": 0, "unread": 0, "max_unread": 0, "evicted": 0}
+        age_at_read = Counter()
+        for agent in self.__communicating_agents():
+            mailbox = agent.get_mailbox_statistics()
+            for key in ("received", "read", "unread", "evicted"):
+                mailboxes[key] += mailbox[key]
+            mailboxes["max_unread"] = max(mailboxes["max_unread"], mailbox["unread"])
+            age_at_read.update(mailbox["age_at_read"])
+        mailboxes["age_at_read"] = dict(sorted(age_at_read.items()))
+        return {
+            "step": self.__now(),
+            "sent": self.__sent_count,
+            "delivered": self.__delivered_count,
+            "dropped": self.__dropped_count,
+            "in_flight": self.get_in_flight_count(),
+            "sent_by_performative": {str(performative): count
+                                     for performative, count in self.__sent_by_performative.items()},
+            "sent_by_sender": dict(self.__sent_by_exp),
+            "latency": dict(sorted(self.__latency.items())),
+            "mailboxes": mailboxes,
+        }
+
+    def __now(self):
+        """ Return the current step of the scheduler.
+        """
+        return getattr(self.__scheduler, "steps", 0)
+
+    def __communicating_agents(self):
+        """ Iterate over the agents having a mailbox.
+        """
+        agents = self.__agents_by_id.values() if self.__indexed else self.__scheduler.agents
+        return (agent for agent in agents if hasattr(agent, "get_mailbox_statistics"))
 
     def dispatch_message(self, message):
         """ Dispatch the message to the right agent.
+        The receiver is looked up by unique_id first, then as a topic, then by name.
+        With a shared transport, a message for an agent of another service is ignored.
         """
-        self.find_agent_from_name(message.get_dest()).receive_message(message)
+        dest = message.get_dest()
+        subscribers = self.__topics.get(dest)
+        if subscribers is not None and dest not in self.__agents_by_id:
+            if len(subscribers) == 0:
+                if not self.__transport.shared:
+                    self.__dropped_count += 1
+                return
+            for subscriber in subscribers.values():
+                subscriber.receive_message(message)
+            self.__delivered_count += len(subscribers)
+            return
+        agent = self.find_agent_from_id(dest)
+        if agent is None:
+            agent = self.find_agent_from_name(dest)
+        if agent is None and self.__transport.shared:
+            return
+        agent.receive_message(message)
+        self.__delivered_count += 1
 
     def dispatch_messages(self):
-        """ Proceed each message received by the message service.
+        """ Flush the transport and proceed each message received by the message service.
         """
-        if len(self.__messages_to_proceed) > 0:
-            for message in self.__messages_to_proceed:
-                self.dispatch_message(message)
+        self.__transport.flush()
+        now = self.__now()
+        for sent, count in self.__pending_sends:
+            self.__latency[now - sent] += count
+        self.__pending_sends = []
+        for message in self.__transport.receive():
+            self.dispatch_message(message)
+
+    def find_agent_from_id(self, unique_id):
+        """ Return the agent with the given unique_id, or None.
+        """
+        if self.__indexed:
+            return self.__agents_by_id.get(unique_id)
+        for agent in self.__scheduler.agents:
+            if agent.unique_id == unique_id:
+                return agent
 
-        self.__messages_to_proceed.clear()
+    def find_agents_from_name(self, agent_name):
+        """ Return all the agents sharing the agent name given.
+        """
+        if self.__indexed:
+            return list(self.__agents_by_name.get(agent_name, {}).values())
+        return [agent for agent in self.__scheduler.agents if agent.get_name() == agent_name]
 
     def find_agent_from_name(self, agent_name):
         """ Return the agent according to the agent name given.
         """
+        if self.__indexed:
+            group = self.__agents_by_name.get(agent_name)
+            if group:
+                return next(iter(group.values()))
+            return None
         for agent in self.__scheduler.agents:
             if agent.get_name() == agent_name:
                 return agent
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+from robots.communication.transport.Transport import Transport
+
+
+class InMemoryTransport(Transport):
+    """InMemoryTransport class.
+    Transport of a message service whose agents all live in the same process.
+
+    The batch is handed over as a list of the message objects themselves, nothing is copied
+    or serialised. This is the default transport of the MessageService.
+
+    attr:
+        delivered: the messages of the last flush, until they are received (list)
+    """
+
+    def __init__(self):
+        """ Create a new InMemoryTransport object.
+        """
+        super().__init__()
+        self.__delivered = []
+
+    def flush(self):
+        """ Make the buffered messages available to receive().
+        """
+        if self.__delivered:
+            self.__delivered.extend(self._outgoing)
+        else:
+            self.__delivered = self._outgoing
+        self._outgoing = []
+
+    def receive(self):
+        """ Return the messages of the batches flushed since the last call.
+        """
+        messages = self.__delivered
+        self.__delivered = []
+        return messages
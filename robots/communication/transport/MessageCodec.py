@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import marshal
+import pickle
+
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+
+
+class MessageCodec:
+    """MessageCodec class.
+    Compact serialisation of a batch of messages, used by the transports crossing processes.
+
+    A message is encoded as the tuple (sender, receiver, performative value, content) and a
+    batch as the tuple of its messages. The batch is written with marshal, which is compact
+    and fast for the ints, strings and tuples the robots exchange; a batch whose contents
+    marshal can't write (e.g. custom objects) falls back to pickle. The first byte of the
+    payload tells which one was used.
+    """
+
+    MARSHAL = b'M'
+    PICKLE = b'P'
+
+    def encode_batch(self, messages):
+        """ Return the batch of messages as bytes.
+        """
+        batch = tuple((message.get_exp(), message.get_dest(), message.get_performative().value,
+                       message.get_content()) for message in messages)
+        try:
+            return self.MARSHAL + marshal.dumps(batch)
+        except ValueError:
+            return self.PICKLE + pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode_batch(self, data):
+        """ Return the list of messages encoded in data by encode_batch.
+        """
+        kind, payload = data[:1], data[1:]
+        if kind == self.MARSHAL:
+            batch = marshal.loads(payload)
+        elif kind == self.PICKLE:
+            batch = pickle.loads(payload)
+        else:
+            raise ValueError("Unknown message batch encoding " + repr(kind))
+        return [Message(sender, receiver, MessagePerformative(performative), content)
+                for sender, receiver, performative, content in batch]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+
+from robots.communication.transport.MessageCodec import MessageCodec
+from robots.communication.transport.Transport import Transport
+
+
+class QueueTransport(Transport):
+    """QueueTransport class.
+    Transport shared by a group of message services, usually in different processes, through
+    multiprocessing queues.
+
+    Every endpoint of the group owns an inbox queue. On flush an endpoint encodes its buffered
+    messages once and puts the batch in every inbox, its own included, and receive() waits
+    for the batch of every endpoint of the group, so the services of the group step in lock
+    step. The batches are delivered in endpoint order, whatever the order they arrived in, and
+    a batch of an endpoint already one flush ahead is kept for the next receive().
+    Create the group with QueueTransport.create_group and hand one endpoint to each process.
+
+    attr:
+        index: the position of the endpoint in its group (int)
+        inboxes: the inbox queue of every endpoint of the group (list)
+        codec: the serialisation of the batches (MessageCodec)
+        timeout: the number of seconds receive() waits for a batch, None for no limit
+        sequence: the number of batches flushed by the endpoint (int)
+        early_batches: the batches received ahead of their flush, by (sequence, index) (dict)
+    """
+
+    shared = True
+
+    def __init__(self, index, inboxes, codec=None, timeout=None):
+        """ Create a new QueueTransport object.
+        """
+        super().__init__()
+        self.__index = index
+        self.__inboxes = inboxes
+        self.__codec = codec if codec is not None else MessageCodec()
+        self.__timeout = timeout
+        self.__sequence = 0
+        self.__early_batches = {}
+
+    @staticmethod
+    def create_group(count, context=None, timeout=None):
+        """ Return count transports sharing their inboxes.
+        context: the multiprocessing context the queues are created with, the default one if None
+        """
+        context = context if context is not None else multiprocessing
+        inboxes = [context.Queue() for _ in range(count)]
+        return [QueueTransport(index, inboxes, timeout=timeout) for index in range(count)]
+
+    def get_index(self):
+        """ Return the position of the endpoint in its group.
+        """
+        return self.__index
+
+    def flush(self):
+        """ Put the batch of the buffered messages in the inbox of every endpoint.
+        """
+        batch = (self.__sequence, self.__index, self.__codec.encode_batch(self._outgoing))
+        self._outgoing = []
+        self.__sequence += 1
+        for inbox in self.__inboxes:
+            inbox.put(batch)
+
+    def receive(self):
+        """ Wait for the batch of every endpoint of the group and return their messages.
+        """
+        inbox = self.__inboxes[self.__index]
+        sequence = self.__sequence - 1
+        batches = {}
+        for index in range(len(self.__inboxes)):
+            data = self.__early_batches.pop((sequence, index), None)
+            if data is not None:
+                batches[index] = data
+        while len(batches) < len(self.__inboxes):
+            batch_sequence, index, data = inbox.get(timeout=self.__timeout)
+            if batch_sequence == sequence:
+                batches[index] = data
+            else:
+                self.__early_batches[batch_sequence, index] = data
+        messages = []
+        for index in sorted(batches):
+            messages.extend(self.__codec.decode_batch(batches[index]))
+        return messages
+
+    def close(self):
+        """ Stop the feeder thread of the queues of this endpoint.
+        """
+        for inbox in self.__inboxes:
+            inbox.close()
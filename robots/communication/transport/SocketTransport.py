@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import marshal
+import threading
+from multiprocessing.connection import Client, Listener
+
+from robots.communication.transport.MessageCodec import MessageCodec
+from robots.communication.transport.Transport import Transport
+
+DEFAULT_AUTHKEY = b'radioactive-messages'
+
+
+class MessageBroker:
+    """MessageBroker class.
+    Local stand-in of a message broker relaying the batches of socket transports.
+
+    The broker listens on a local socket and waits for a known number of endpoints. Each step
+    it reads one batch from every endpoint, then sends all the batches, in endpoint order,
+    back to every endpoint. It serves from a daemon thread and stops when an endpoint
+    disconnects.
+
+    attr:
+        endpoints: the number of endpoints relayed (int)
+        listener: the socket the endpoints connect to (Listener)
+        thread: the thread relaying the batches (Thread)
+    """
+
+    def __init__(self, endpoints, address=('localhost', 0), authkey=DEFAULT_AUTHKEY):
+        """ Create a new MessageBroker object and start serving.
+        """
+        self.__endpoints = endpoints
+        # Room for every endpoint connecting at once, a full backlog stalls the late ones
+        self.__listener = Listener(address, backlog=endpoints, authkey=authkey)
+        self.__thread = threading.Thread(target=self.__serve, daemon=True)
+        self.__thread.start()
+
+    def get_address(self):
+        """ Return the address the endpoints connect to.
+        """
+        return self.__listener.address
+
+    def __serve(self):
+        """ Accept the endpoints, then relay their batches until one disconnects.
+        """
+        connections = []
+        try:
+            for _ in range(self.__endpoints):
+                connection = self.__listener.accept()
+                connections.append((connection.recv(), connection))
+            connections = [connection for _, connection in sorted(connections, key=lambda item: item[0])]
+            while True:
+                relayed = marshal.dumps([connection.recv_bytes() for connection in connections])
+                for connection in connections:
+                    connection.send_bytes(relayed)
+        except (EOFError, OSError):
+            pass
+        finally:
+            for connection in connections:
+                connection.close()
+            self.__listener.close()
+
+    def join(self, timeout=None):
+        """ Wait for the broker to stop.
+        """
+        self.__thread.join(timeout)
+
+
+class SocketTransport(Transport):
+    """SocketTransport class.
+    Transport shared by the message services connected to the same MessageBroker.
+
+    On flush the endpoint sends its encoded batch to the broker, and receive() waits for the
+    batches the broker relays, one per endpoint, so the services connected to a broker step
+    in lock step.
+
+    attr:
+        index: the position of the endpoint in the broker's relay order (int)
+        connection: the connection to the broker (Connection)
+        codec: the serialisation of the batches (MessageCodec)
+    """
+
+    shared = True
+
+    def __init__(self, address, index=0, authkey=DEFAULT_AUTHKEY, codec=None):
+        """ Create a new SocketTransport object connected to the broker at address.
+        """
+        super().__init__()
+        self.__index = index
+        self.__codec = codec if codec is not None else MessageCodec()
+        self.__connection = Client(address, authkey=authkey)
+        self.__connection.send(index)
+
+    def get_index(self):
+        """ Return the position of the endpoint in the broker's relay order.
+        """
+        return self.__index
+
+    def flush(self):
+        """ Send the batch of the buffered messages to the broker.
+        """
+        self.__connection.send_bytes(self.__codec.encode_batch(self._outgoing))
+        self._outgoing = []
+
+    def receive(self):
+        """ Wait for the batches relayed by the broker and return their messages.
+        """
+        messages = []
+        for data in marshal.loads(self.__connection.recv_bytes()):
+            messages.extend(self.__codec.decode_batch(data))
+        return messages
+
+    def close(self):
+        """ Disconnect from the broker.
+        """
+        self.__connection.close()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+from abc import ABC, abstractmethod
+
+
+class Transport(ABC):
+    """Transport class.
+    Base class of the transports carrying the messages of a MessageService between steps.
+
+    The messages sent during a step are buffered by the transport, flush() sends them as
+    one batch when the message service dispatches, and receive() returns the messages the
+    service has to deliver to its agents.
+
+    attr:
+        outgoing: the messages sent since the last flush (list)
+        shared: True if the messages of several message services go through the transport,
+            each service then only delivers the messages addressed to its own agents (bool)
+
+    The agents of the message services sharing a transport must have distinct unique_ids.
+    Subclasses implement flush() and receive().
+    """
+
+    shared = False
+
+    def __init__(self):
+        """ Create a new Transport object.
+        """
+        self._outgoing = []
+
+    def send(self, message):
+        """ Buffer a message until the next flush.
+        """
+        self._outgoing.append(message)
+
+    def get_pending_messages(self):
+        """ Return the messages waiting for the next flush.
+        """
+        return list(self._outgoing)
+
+    def get_pending_count(self):
+        """ Return the number of messages waiting for the next flush.
+        """
+        return len(self._outgoing)
+
+    @abstractmethod
+    def flush(self):
+        """ Send the buffered messages as one batch.
+        """
+
+    @abstractmethod
+    def receive(self):
+        """ Return the messages of the batches flushed since the last call.
+        """
+
+    def close(self):
+        """ Release the resources of the transport.
+        """
@@ -0,0 +1,477 @@
+"""
+Distributed runs of the RadioactiveEnv
+
+The grid is split into vertical strips: the three zones, or strips_per_zone
+sub-strips of every zone for very wide grids. Each strip runs in its own worker
+process as a RadioactiveEnv (grid, scheduler, message service) that only holds
+the agents located in the strip.
+
+The workers run in lockstep. At the barrier after every step a worker reports:
+    - the robots that moved out of its strip, with their carried wastes, knowledge,
+      random stream and unread messages
+    - the wastes lying in its two border columns
+    - its waste and message counters
+and the coordinator routes all of it to the workers for the next step.
+
+The messages don't go through the barrier: the message services of the strips
+share a transport (robots.communication.transport), a QueueTransport group with
+the pipes and a SocketTransport per worker, relayed by a MessageBroker of the
+coordinator, with the sockets. Every strip receives the batch of every other one
+when it dispatches at the start of the next step, after the robots crossing a
+border have been moved, and delivers the messages of the robots it holds and of
+the topics to its subscribers.
+
+Robots whose range spans several strips (yellow robots enter the green zone,
+red robots go anywhere) migrate to the worker of the strip they move into.
+The wastes of the columns next to a strip are mirrored as ghost wastes in its
+waste index (halo), so robots on a border still see them. Halos are one
+barrier late, so runs are statistically the same as single process runs but
+not identical.
+
+The workers talk to the coordinator over multiprocessing pipes, or over sockets
+(multiprocessing.connection) so they can also run on other nodes:
+    coordinator: DistributedRadioactiveEnv(transport='socket', address=('0.0.0.0', 6000),
+                                           authkey=b'secret', spawn_workers=False, ...)
+    every node:  python -m robots.distributed --connect coordinator:6000 --authkey secret
+
+Example:
+>>> model = DistributedRadioactiveEnv(width=300, height=50, initial_robots_per_zone=50, strips_per_zone=2, seed=0)
+>>> model.run_model(1000)
+>>> model.close()
+"""
+import argparse
+import bisect
+import copy
+import multiprocessing
+from collections import Counter
+from multiprocessing.connection import Client, Listener
+
+from .agents import Robot, Waste, detach
+from robots.communication.transport.QueueTransport import QueueTransport
+from robots.communication.transport.SocketTransport import MessageBroker, SocketTransport
+from .checkpoint import snapshot, restore
+from .model import RadioactiveEnv, robot_topic, stranded_wastes
+from .zones import ZONE_COLOURS
+
+TRANSPORTS = ('pipe', 'socket')
+
+
+def partition_strips(zone_locations, strips_per_zone=1):
+    '''
+        Split every zone in strips_per_zone strips of (nearly) equal width
+        Return: list of (x_min, x_max), west to east
+    '''
+    strips = []
+    for x_min, x_max in sorted(zone_locations.values()):
+        count = min(strips_per_zone, x_max - x_min)
+        bounds = [x_min + (x_max - x_min) * i // count for i in range(count + 1)]
+        strips.extend(zip(bounds[:-1], bounds[1:]))
+    return strips
+
+
+class GhostWaste():
+    """
+        Copy of a waste lying in a neighbouring strip, only present in the waste index
+    """
+    __slots__ = ('colour',)
+
+    def __init__(self, colour):
+        self.colour = colour
+
+
+class Partition():
+    """
+        The part of a model run by a worker: the agents located in x_min <= x < x_max
+    """
+    def __init__(self, model, index, x_min, x_max, transport):
+        '''
+            model: a copy of the whole model, the agents outside the strip are removed
+            transport: the message transport shared with the other strips
+        '''
+        self.model = model
+        self.index = index
+        self.x_min = x_min
+        self.x_max = x_max
+        # (ghost, pos) of the halo wastes
+        self.ghosts = []
+        # Every strip starts from the same model, give each its own activation order
+        model.random.seed(f'{model._seed}/partition{index}')
+        model.message_service.set_transport(transport)
+        for colour in ZONE_COLOURS:
+            model.message_service.add_topic(robot_topic(colour))
+        for robot in list(model.schedule.get_agents_of_type(Robot)):
+            if not self.owns(robot.pos):
+                self.remove_robot(robot)
+        for waste in list(model.schedule.get_agents_of_type(Waste)):
+            if not self.owns(waste.pos):
+                model.remove_waste(waste)
+                waste.remove()
+
+    def owns(self, pos):
+        return self.x_min <= pos[0] < self.x_max
+
+    def remove_robot(self, robot):
+        '''
+            Take a robot and its carried wastes out of the model
+        '''
+        model = self.model
+        for waste in robot.waste_list:
+            model.waste_carried[robot.colour, waste.colour] -= 1
+            waste.remove()
+        model.grid.remove_agent(robot)
+        model.schedule.remove(robot)
+        robot.remove()
+
+    def export_robot(self, robot):
+        '''
+            Remove a robot leaving the strip
+            Return: its state, without references to the model
+        '''
+        percepts = robot.percepts
+        if percepts is not None:
+            # The copy drops the cell contents, see Percept.__getstate__
+            percepts = copy.copy(percepts)
+            percepts.waste_list = None
+        state = {
+            'unique_id': robot.unique_id,
+            'pos': robot.pos,
+            'colour': robot.colour,
+            'x_range': robot.x_range,
+            'carried': [(waste.unique_id, waste.colour) for waste in robot.waste_list],
+            'knowledge': detach(robot.knowledge),
+            'percepts': percepts,
+            'rng': robot.rng,
+            'messages': robot.get_new_messages(),
+        }
+        self.remove_robot(robot)
+        return state
+
+    def import_robot(self, state):
+        '''
+            Add a robot entering the strip from its exported state
+        '''
+        model = self.model
+        robot = Robot(state['unique_id'], None, model, state['x_range'], True, colour=state['colour'])
+        for unique_id, colour in state['carried']:
+            robot.waste_list.append(Waste(unique_id, None, model, colour=colour))
+            model.waste_carried[robot.colour, colour] += 1
+        robot.knowledge = state['knowledge']
+        robot.knowledge.waste_list = robot.waste_list
+        robot.percepts = state['percepts']
+        if robot.percepts is not None:
+            robot.percepts.waste_list = robot.waste_list
+        robot.rng = state['rng']
+        model.grid.place_agent(robot, state['pos'])
+        model.schedule.add(robot)
+        model.message_service.subscribe(robot_topic(robot.colour), robot)
+        for message in state['messages']:
+            robot.receive_message(message)
+
+    def set_halo(self, wastes):
+        '''
+            Replace the ghost wastes by wastes, a list of (pos, colour)
+        '''
+        model = self.model
+        index = model.waste_index
+        previous = set()
+        for ghost, pos in self.ghosts:
+            index.remove(ghost, pos)
+            previous.add((pos, ghost.colour))
+        self.ghosts = []
+        for pos, colour in wastes:
+            ghost = GhostWaste(colour)
+            index.add(ghost, pos)
+            self.ghosts.append((ghost, pos))
+        # The grid doesn't hold the ghosts, stamp the cells where they changed for the incremental percepts
+        for pos in {pos for pos, _ in previous.symmetric_difference(wastes)}:
+            model.grid.touch(pos)
+
+    def border_wastes(self, x):
+        '''
+            Return: (pos, colour) of the wastes lying in column x
+        '''
+        wastes = []
+        for colour, cells in self.model.waste_index.by_colour.items():
+            for y in range(self.model.height):
+                for waste in cells.get((x, y), ()):
+                    if not isinstance(waste, GhostWaste):
+                        wastes.append(((x, y), colour))
+        return wastes
+
+    def apply(self, inbound):
+        '''
+            Take in what the coordinator routed to this strip at the barrier
+        '''
+        self.set_halo(inbound['halo'])
+        for state in inbound['robots']:
+            self.import_robot(state)
+
+    def barrier(self):
+        '''
+            Return: the report of the strip for the coordinator, see the module docstring
+        '''
+        model = self.model
+        service = model.message_service
+        robots = [
+            self.export_robot(robot)
+            for robot in list(model.schedule.get_agents_of_type(Robot))
+            if not self.owns(robot.pos)
+        ]
+        return {
+            'robots': robots,
+            'borders': {x: self.border_wastes(x) for x in {self.x_min, self.x_max - 1}},
+            'counters': {
+                'waste': model.schedule.get_type_count(Waste),
+                'on_grid': {colour: model.schedule.get_type_colour_count(Waste, colour) for colour in ZONE_COLOURS},
+                'disposed': model.waste_disposed,
+                'carried': dict(model.waste_carried),
+                # What each robot carries is only needed once the strip holds no waste left to move
+                'loads': model.robot_loads() if model.schedule.get_type_count(Waste) == model.waste_disposed else None,
+                'messages_sent': service.get_sent_count(),
+            },
+        }
+
+
+def serve(connection, transport=None, broker_host='localhost', authkey=None):
+    '''
+        Worker loop: run the strip sent by the coordinator until it says stop
+        transport: the message transport of the strip, None to connect to the
+            MessageBroker of the coordinator, on broker_host
+    '''
+    partition = None
+    while True:
+        command, payload = connection.recv()
+        if command == 'init':
+            data, index, x_min, x_max, broker_port = payload
+            if transport is None:
+                transport = SocketTransport((broker_host, broker_port), index, authkey=authkey)
+            partition = Partition(restore(data), index, x_min, x_max, transport)
+            connection.send(partition.barrier())
+        elif command == 'step':
+            partition.apply(payload)
+            partition.model.step()
+            connection.send(partition.barrier())
+        elif command == 'stop':
+            if partition is not None:
+                partition.model.close()
+            connection.close()
+            return
+
+
+def run_worker(address, authkey):
+    '''
+        Connect to a coordinator listening on address and serve one strip
+    '''
+    serve(Client(address, authkey=authkey), broker_host=address[0], authkey=authkey)
+
+
+class DistributedRadioactiveEnv():
+    """
+        Coordinator of a RadioactiveEnv split into strips run by worker processes
+    """
+    def __init__(self, strips_per_zone=1, transport='pipe', address=None, authkey=b'radioactive',
+                 spawn_workers=True, **params):
+        '''
+            strips_per_zone: number of strips (workers) per zone
+            transport: 'pipe' or 'socket'
+            address: (host, port) the socket transport listens on, a free local port by default
+            spawn_workers: start the socket workers locally, otherwise wait for
+                run_worker() to connect from other nodes
+            params: the RadioactiveEnv parameters, the metrics can't be streamed
+        '''
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport}, expected one of {TRANSPORTS}")
+        if params.get('metrics_path') is not None:
+            raise ValueError("The metrics of a distributed model can't be streamed")
+        model = RadioactiveEnv(**params)
+        self.width = model.width
+        self.height = model.height
+        self.strips = partition_strips(model.zone_locations, strips_per_zone)
+        self._strip_starts = [x_min for x_min, _ in self.strips]
+        data = snapshot(model)
+        del model
+
+        self.steps = 0
+        self.steps_to_clear = None
+        self.running = True
+        self._processes = []
+        # Message transports of the strips with the pipes, the broker relaying them with the sockets
+        self._message_transports = []
+        self._broker = None
+        self._connections = self._start_workers(transport, address, authkey, spawn_workers)
+        broker_port = None
+        if transport == 'socket':
+            host = address[0] if address is not None else 'localhost'
+            self._broker = MessageBroker(len(self.strips), address=(host, 0), authkey=authkey)
+            broker_port = self._broker.get_address()[1]
+        for index, (connection, (x_min, x_max)) in enumerate(zip(self._connections, self.strips)):
+            connection.send(('init', (data, index, x_min, x_max, broker_port)))
+        self._route([connection.recv() for connection in self._connections])
+
+    def _start_workers(self, transport, address, authkey, spawn_workers):
+        context = multiprocessing.get_context()
+        connections = []
+        if transport == 'pipe':
+            # Kept until close, the queues must outlive the start of the workers
+            self._message_transports = QueueTransport.create_group(len(self.strips), context=context)
+            for message_transport in self._message_transports:
+                connection, worker_connection = context.Pipe()
+                process = context.Process(target=serve, args=(worker_connection, message_transport), daemon=True)
+                process.start()
+                worker_connection.close()
+                self._processes.append(process)
+                connections.append(connection)
+            return connections
+        with Listener(address or ('localhost', 0), backlog=len(self.strips), authkey=authkey) as listener:
+            if spawn_workers:
+                for _ in self.strips:
+                    process = context.Process(target=run_worker, args=(listener.address, authkey), daemon=True)
+                    process.start()
+                    self._processes.append(process)
+            for _ in self.strips:
+                connections.append(listener.accept())
+        return connections
+
+    def _owner(self, x):
+        return bisect.bisect_right(self._strip_starts, x) - 1
+
+    def _route(self, reports):
+        '''
+            Build the inbound batch of every strip from the reports of the barrier
+        '''
+        count = len(self.strips)
+        inbound = [{'robots': [], 'halo': []} for _ in range(count)]
+        # Robots between two strips, their carried wastes are counted by the coordinator
+        self._in_transit = []
+        for report in reports:
+            for state in report['robots']:
+                inbound[self._owner(state['pos'][0])]['robots'].append(state)
+                self._in_transit.append(state)
+        for index, report in enumerate(reports):
+            x_min, x_max = self.strips[index]
+            if index > 0:
+                inbound[index - 1]['halo'].extend(report['borders'][x_min])
+            if index < count - 1:
+                inbound[index + 1]['halo'].extend(report['borders'][x_max - 1])
+        self._inbound = inbound
+        self._counters = [report['counters'] for report in reports]
+
+    def step(self):
+        for connection, inbound in zip(self._connections, self._inbound):
+            connection.send(('step', inbound))
+        self._route([connection.recv() for connection in self._connections])
+        self.steps += 1
+
+    def _carried(self):
+        '''
+            Return: the carried wastes by (robot colour, waste colour), robots in transit included
+        '''
+        carried = Counter()
+        for counters in self._counters:
+            carried.update(counters['carried'])
+        for state in self._in_transit:
+            for _, colour in state['carried']:
+                carried[state['colour'], colour] += 1
+        return carried
+
+    def is_cleared(self):
+        '''
+            Same condition as RadioactiveEnv.is_cleared, over all the strips
+        '''
+        disposed = sum(counters['disposed'] for counters in self._counters)
+        if sum(counters['waste'] for counters in self._counters) != disposed:
+            return False
+        for (robot_colour, waste_colour), count in self._carried().items():
+            if count > 0 and (waste_colour != robot_colour or robot_colour == 'red'):
+                return False
+        return stranded_wastes(self._loads()) is not None
+
+    def _loads(self):
+        '''
+            Return: the loads of the robots, as RadioactiveEnv.robot_loads, robots in transit included
+            Only once every strip holds no waste left to move
+        '''
+        loads = []
+        for counters in self._counters:
+            loads.extend(counters['loads'])
+        for state in self._in_transit:
+            if state['carried']:
+                loads.append((state['colour'], [colour for _, colour in state['carried']]))
+        return loads
+
+    def get_metrics(self):
+        '''
+            Summary of the run so far, as RadioactiveEnv.get_metrics
+        '''
+        disposed = sum(counters['disposed'] for counters in self._counters)
+        waste_remaining = Counter()
+        for counters in self._counters:
+            waste_remaining.update(counters['on_grid'])
+        for (_, waste_colour), count in self._carried().items():
+            waste_remaining[waste_colour] += count
+        waste_remaining['red'] -= disposed
+        stranded = Counter()
+        if self.is_cleared():
+            stranded = stranded_wastes(self._loads())
+        waste_remaining.subtract(stranded)
+        return {
+            'steps': self.steps,
+            'steps_to_clear': self.steps_to_clear,
+            'waste_remaining': {colour: waste_remaining[colour] for colour in ZONE_COLOURS},
+            'waste_stranded': {colour: stranded[colour] for colour in ZONE_COLOURS},
+            'waste_disposed': disposed,
+            'messages_sent': sum(counters['messages_sent'] for counters in self._counters),
+        }
+
+    def run_model(self, step_count=200):
+        '''
+            Run until the grid is cleared or step_count steps have been done
+            Return: the summary metrics of get_metrics
+        '''
+        for _ in range(step_count):
+            if self.is_cleared():
+                break
+            self.step()
+        if self.steps_to_clear is None and self.is_cleared():
+            self.steps_to_clear = self.steps
+            self.running = False
+        return self.get_metrics()
+
+    def close(self):
+        '''
+            Stop the workers
+        '''
+        for connection in self._connections:
+            connection.send(('stop', None))
+            connection.close()
+        self._connections = []
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        for message_transport in self._message_transports:
+            message_transport.close()
+        self._message_transports = []
+        if self._broker is not None:
+            # It stops once the workers have disconnected
+            self._broker.join()
+            self._broker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Worker of a distributed RadioactiveEnv')
+    parser.add_argument('--connect', required=True, help='host:port of the coordinator')
+    parser.add_argument('--authkey', default='radioactive')
+    args = parser.parse_args(argv)
+    host, port = args.connect.rsplit(':', 1)
+    run_worker((host, int(port)), args.authkey.encode())
+
+
+if __name__ == '__main__':
+    main()
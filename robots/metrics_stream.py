@@ -0,0 +1,250 @@
+"""
+Streaming columnar export of model and agent metrics
+
+StreamingCollector replaces mesa.DataCollector for long runs: reporter values
+are buffered in fixed size NumPy chunks and appended to disk whenever a chunk
+is full, so memory stays flat whatever the number of steps.
+
+Output layout, one directory per table ('model' and 'agent'):
+    binary (default): one raw little endian file per column (<column>.bin)
+                      plus schema.json, read back with memory maps
+    csv: a single <table>.csv file
+    parquet: <table>-<part>.parquet files, one row group per chunk (needs pyarrow),
+             a new part is started when the collector is restored from a checkpoint
+
+A new collector replaces the tables already in its directory.
+
+Example:
+>>> model = RadioactiveEnv(metrics_path='runs/seed0')
+>>> model.run_model(100000)
+>>> robots = read_metrics('runs/seed0', 'agent')
+>>> robots['carried'][robots['agent_id'] == 42]
+"""
+import csv
+import glob
+import json
+import os
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ('binary', 'csv', 'parquet')
+
+
+class _Table():
+    """
+        Chunk buffer of one table, flushed to disk when full
+    """
+    def __init__(self, directory, name, columns, chunk_size, format):
+        self.path = os.path.join(directory, name)
+        self.name = name
+        # column -> dtype
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.format = format
+        self.buffers = {column: np.empty(chunk_size, dtype=dtype) for column, dtype in columns.items()}
+        self.size = 0
+        self.rows = 0
+        # Size of the csv file after the last flush
+        self._csv_bytes = 0
+        self._parquet_writer = None
+        self._parquet_part = 0
+        os.makedirs(self.path, exist_ok=True)
+        # A new table replaces the one of a previous run in the same directory,
+        # its files are appended to and would be mixed with the new rows
+        for file_name in os.listdir(self.path):
+            if file_name == 'schema.json' or file_name.endswith(('.bin', '.csv', '.parquet')):
+                os.remove(os.path.join(self.path, file_name))
+
+    def __getstate__(self):
+        # The parquet writer holds an open file, a restored table writes the next part
+        state = self.__dict__.copy()
+        if state['_parquet_writer'] is not None:
+            state['_parquet_writer'] = None
+            state['_parquet_part'] += 1
+        return state
+
+    def append(self, values):
+        '''
+            Add one row, values in the order of the columns
+        '''
+        for buffer, value in zip(self.buffers.values(), values):
+            buffer[self.size] = value
+        self.size += 1
+        if self.size == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.size == 0:
+            return
+        chunk = {column: buffer[:self.size] for column, buffer in self.buffers.items()}
+        if self.format == 'binary':
+            for column, values in chunk.items():
+                with open(os.path.join(self.path, f'{column}.bin'), 'ab') as output:
+                    values.astype(values.dtype.newbyteorder('<'), copy=False).tofile(output)
+        elif self.format == 'csv':
+            file_path = os.path.join(self.path, f'{self.name}.csv')
+            with open(file_path, 'a', newline='') as output:
+                writer = csv.writer(output)
+                if self._csv_bytes == 0:
+                    writer.writerow(self.columns)
+                writer.writerows(zip(*(values.tolist() for values in chunk.values())))
+                self._csv_bytes = output.tell()
+        else:
+            table = pyarrow.table(chunk)
+            if self._parquet_writer is None:
+                self._parquet_writer = pyarrow.parquet.ParquetWriter(
+                    os.path.join(self.path, f'{self.name}-{self._parquet_part:05d}.parquet'), table.schema)
+            self._parquet_writer.write_table(table)
+        self.rows += self.size
+        self.size = 0
+        self._write_schema()
+
+    def close(self):
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def checkpoint(self):
+        '''
+            Write the buffered rows and end the parquet part, so the state can be
+            snapshot and the rows written from now on can be told apart
+        '''
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+            self._parquet_part += 1
+
+    def resume(self):
+        '''
+            Cut the files back to the rows of the checkpoint this table was restored from,
+            dropping the rows written after it
+        '''
+        if self.format == 'binary':
+            for column, dtype in self.columns.items():
+                file_path = os.path.join(self.path, f'{column}.bin')
+                if os.path.exists(file_path):
+                    os.truncate(file_path, self.rows * np.dtype(dtype).itemsize)
+        elif self.format == 'csv':
+            file_path = os.path.join(self.path, f'{self.name}.csv')
+            if os.path.exists(file_path):
+                os.truncate(file_path, self._csv_bytes)
+        else:
+            for part in glob.glob(os.path.join(self.path, f'{self.name}-*.parquet')):
+                if int(part[-len('00000.parquet'):-len('.parquet')]) >= self._parquet_part:
+                    os.remove(part)
+        self._write_schema()
+
+    def _write_schema(self):
+        schema = {
+            'format': self.format,
+            'rows': self.rows,
+            'columns': {column: np.dtype(dtype).newbyteorder('<').str for column, dtype in self.columns.items()},
+        }
+        with open(os.path.join(self.path, 'schema.json'), 'w') as output:
+            json.dump(schema, output)
+
+
+class StreamingCollector():
+    """
+        Collect model level and agent level reporters into chunked columnar files
+
+        model_reporters: {column: function(model)}
+        agent_reporters: {column: function(agent)}, collected for the agents of agent_type
+        Reporter values are stored as float64, step and agent_id as int64.
+    """
+    def __init__(self, path, model_reporters, agent_reporters=None, agent_type=None,
+                 chunk_size=4096, format='binary'):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format}, expected one of {FORMATS}")
+        if format == 'parquet' and pyarrow is None:
+            raise ImportError("The parquet format needs pyarrow")
+        self.path = path
+        self.model_reporters = model_reporters
+        self.agent_reporters = agent_reporters or {}
+        self.agent_type = agent_type
+        columns = {'step': np.int64}
+        columns.update({column: np.float64 for column in model_reporters})
+        self.model_table = _Table(path, 'model', columns, chunk_size, format)
+        self.agent_table = None
+        if self.agent_reporters:
+            columns = {'step': np.int64, 'agent_id': np.int64}
+            columns.update({column: np.float64 for column in self.agent_reporters})
+            self.agent_table = _Table(path, 'agent', columns, chunk_size, format)
+
+    def collect(self, model):
+        '''
+            Record the reporters for the current step of the model
+        '''
+        step = model.schedule.steps
+        self.model_table.append([step] + [reporter(model) for reporter in self.model_reporters.values()])
+        if self.agent_table is not None:
+            reporters = list(self.agent_reporters.values())
+            for agent in model.schedule.get_agents_of_type(self.agent_type):
+                self.agent_table.append([step, agent.unique_id] + [reporter(agent) for reporter in reporters])
+
+    def flush(self):
+        '''
+            Write the partially filled chunks, the collector can keep being used
+        '''
+        self.model_table.flush()
+        if self.agent_table is not None:
+            self.agent_table.flush()
+
+    def close(self):
+        self.model_table.close()
+        if self.agent_table is not None:
+            self.agent_table.close()
+
+    def checkpoint(self):
+        '''
+            Called before the collector is snapshot, see checkpoint.snapshot
+        '''
+        self.model_table.checkpoint()
+        if self.agent_table is not None:
+            self.agent_table.checkpoint()
+
+    def resume(self):
+        '''
+            Called on the collector restored from a snapshot: the rows the original
+            collector wrote after the snapshot are dropped, the new ones follow the snapshot
+        '''
+        self.model_table.resume()
+        if self.agent_table is not None:
+            self.agent_table.resume()
+
+
+def read_metrics(path, table='model'):
+    '''
+        Read back a table written by StreamingCollector
+        Return: {column: array}, the arrays of the binary format are read only memory maps
+    '''
+    directory = os.path.join(path, table)
+    with open(os.path.join(directory, 'schema.json')) as schema_file:
+        schema = json.load(schema_file)
+    if schema['format'] == 'binary':
+        return {
+            column: np.memmap(os.path.join(directory, f'{column}.bin'), dtype=np.dtype(dtype), mode='r',
+                              shape=(schema['rows'],))
+            for column, dtype in schema['columns'].items()
+        }
+    if schema['format'] == 'csv':
+        with open(os.path.join(directory, f'{table}.csv'), newline='') as input_file:
+            rows = list(csv.reader(input_file))
+        header, rows = rows[0], rows[1:]
+        return {
+            column: np.array([row[i] for row in rows], dtype=np.dtype(schema['columns'][column]))
+            for i, column in enumerate(header)
+        }
+    if pyarrow is None:
+        raise ImportError("Reading the parquet format needs pyarrow")
+    parts = sorted(glob.glob(os.path.join(directory, f'{table}-*.parquet')))
+    data = pyarrow.concat_tables([pyarrow.parquet.read_table(part, memory_map=True) for part in parts])
+    return {column: data.column(column).to_numpy() for column in data.column_names}
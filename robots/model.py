@@ -1,13 +1,135 @@
+from collections import Counter
+
 import mesa
 
-from .agents import Waste, Robot, Grid_Tile
+from .agents import Waste, Robot, StepRandom, agent_seed, bid
 from .scheduler import RandomActivationByTypeFiltered
 from .percepts import Percept
+from .zones import ZoneRaster
+from .waste_index import WasteIndex
+from .neighbourhoods import NeighbourhoodTable
+from .versioned_grid import VersionedMultiGrid, NO_CHANGES
+from .metrics_stream import StreamingCollector
+from .profiling import StepProfiler
+from .trace import EventTrace, EventKind, INFO, DEBUG, OFF, colour_code
+from .parallel import DeliberationPool
 from robots.communication.agent.CommunicatingAgent import CommunicatingAgent
 from robots.communication.message.Message import Message
 from robots.communication.message.MessagePerformative import MessagePerformative
 from robots.communication.message.MessageService import MessageService
 
+STEP_MODES = ('sequential', 'synchronous')
+
+# Colour of the robots a transformed waste is handed over to
+NEXT_COLOUR = {'green': 'yellow', 'yellow': 'red'}
+
+
+def robot_topic(colour):
+    '''
+        Message service topic the robots of a colour are subscribed to
+    '''
+    return f'robots:{colour}'
+
+
+def stranded_wastes(loads):
+    '''
+        Wastes left once the grid is cleared: each one carried alone by a robot of its colour
+        (not red), so there is no other waste to transform it with
+        loads: (robot colour, colours of the carried wastes) of the robots carrying wastes
+        Return: Counter of the wastes by colour, None if a robot carries any other load
+    '''
+    stranded = Counter()
+    for robot_colour, waste_colours in loads:
+        if robot_colour == 'red' or len(waste_colours) != 1 or waste_colours[0] != robot_colour:
+            return None
+        stranded[robot_colour] += 1
+    return stranded
+
+
+def count_waste(model):
+    return model.schedule.get_type_count(Waste)
+
+
+def count_green_waste(model):
+    return model.schedule.get_type_colour_count(Waste, 'green')
+
+
+def count_yellow_waste(model):
+    return model.schedule.get_type_colour_count(Waste, 'yellow')
+
+
+def count_red_waste(model):
+    return model.schedule.get_type_colour_count(Waste, 'red') - model.waste_disposed
+
+
+def count_carried_waste(model):
+    return sum(model.waste_carried.values())
+
+
+def count_disposed_waste(model):
+    return model.waste_disposed
+
+
+def count_messages_sent(model):
+    return model.message_service.get_sent_count()
+
+
+def count_messages_delivered(model):
+    return model.message_service.get_delivered_count()
+
+
+def count_messages_dropped(model):
+    return model.message_service.get_dropped_count()
+
+
+def count_messages_in_flight(model):
+    return model.message_service.get_in_flight_count()
+
+
+def count_unread_messages(model):
+    return model.message_service.get_unread_count()
+
+
+# Model level reporters, they read the counters in O(1)
+MODEL_REPORTERS = {
+    "Waste": count_waste,
+    "Green waste": count_green_waste,
+    "Yellow waste": count_yellow_waste,
+    "Red waste": count_red_waste,
+    "Carried waste": count_carried_waste,
+    "Disposed waste": count_disposed_waste,
+    "Messages sent": count_messages_sent,
+    "Messages delivered": count_messages_delivered,
+    "Messages dropped": count_messages_dropped,
+    "Messages in flight": count_messages_in_flight,
+    "Unread messages": count_unread_messages,
+}
+
+
+def robot_x(robot):
+    return robot.pos[0]
+
+
+def robot_y(robot):
+    return robot.pos[1]
+
+
+def robot_carried(robot):
+    return len(robot.waste_list)
+
+
+def robot_known_locations(robot):
+    return len(robot.knowledge.waste_beliefs)
+
+
+# Robot level reporters, only written by the streaming collector
+ROBOT_REPORTERS = {
+    "x": robot_x,
+    "y": robot_y,
+    "carried": robot_carried,
+    "known_locations": robot_known_locations,
+}
+
 
 class RadioactiveEnv(mesa.Model):
     """
@@ -15,28 +137,80 @@ class RadioactiveEnv(mesa.Model):
     """
     def __init__(
         self,
+        # TODO: Hardcoded for now in server
         width=21,
         height=5,
         initial_wastes_per_zone=6,
-        initial_robots_per_zone=1
-        # TODO: Hardcoded for now in server
+        initial_robots_per_zone=1,
+        seed=None,
+        mailbox_max_messages=100,
+        mailbox_max_age=None,
+        metrics_path=None,
+        metrics_format='binary',
+        metrics_chunk_size=4096,
+        profile=False,
+        trace_level=OFF,
+        trace_capacity=65536,
+        trace_path=None,
+        step_mode='sequential',
+        deliberation_executor=None,
+        deliberation_workers=None,
+        deliberation_batch_size=256,
+        message_transport=None,
+        incremental_percepts=False
     ):
         """
         Create a model with wastes to move.
 
         Args:
-
+            seed: seed of the model's random number generator (read by mesa.Model)
+            mailbox_max_messages: number of read messages kept by each agent's mailbox, None for all
+            mailbox_max_age: number of steps read messages are kept, None for no limit
+            metrics_path: directory the metrics are streamed to instead of being kept in
+                the DataCollector, see metrics_stream.StreamingCollector
+            metrics_format: 'binary', 'csv' or 'parquet'
+            metrics_chunk_size: number of rows buffered per table before writing them
+            profile: start with the step profiler enabled, it can be switched at any
+                time with model.profiler.enabled
+            trace_level: level of the event trace, see trace.EventTrace, it can be changed
+                at any time with model.trace.level
+            trace_capacity: number of events kept in the trace ring buffer
+            trace_path: file the full trace is written to, None to only keep the ring buffer
+            step_mode: 'sequential', each robot senses, deliberates and acts in turn,
+                or 'synchronous', see step_synchronous
+            deliberation_executor: None, 'thread' or 'process', where the synchronous mode deliberates
+            deliberation_workers: size of the deliberation pool, the number of cores by default
+            deliberation_batch_size: number of robots deliberated per pool task
+            message_transport: transport of the messages between steps, an InMemoryTransport
+                by default, see robots.communication.transport
+            incremental_percepts: only send the robots the neighbour cells that changed since
+                they last saw them, instead of the contents of the whole neighbourhood, it can
+                be changed at any time with model.incremental_percepts
         """
         super().__init__()
+        # Timers and counters of the step phases, see profiling.StepProfiler
+        self.profiler = StepProfiler(enabled=profile)
+        # Actions and messages of the robots, see trace.EventTrace
+        self.trace = EventTrace(trace_level, trace_capacity, trace_path)
+        if step_mode not in STEP_MODES:
+            raise ValueError(f"Unknown step mode {step_mode}, expected one of {STEP_MODES}")
+        self.step_mode = step_mode
+        self.deliberation_pool = DeliberationPool(
+            deliberation_executor, deliberation_workers, deliberation_batch_size)
          # set messages 
-        self.schedule = RandomActivationByTypeFiltered(self)
-        self.__messages_service = MessageService(self.schedule)
-        MessageService.get_instance().set_instant_delivery(False)
+        # Wastes don't act, they are only tracked by the schedule for counting
+        self.schedule = RandomActivationByTypeFiltered(self, passive_types=(Waste,))
+        # Message service of this model, injected into its agents
+        self.message_service = MessageService(self.schedule, instant_delivery=False, transport=message_transport)
         # Set parameters
         self.width = width
         self.height = height
         self.initial_wastes_per_zone = initial_wastes_per_zone
         self.initial_robots_per_zone = initial_robots_per_zone
+        self.mailbox_max_messages = mailbox_max_messages
+        self.mailbox_max_age = mailbox_max_age
+        # Step at which the grid was first found cleared, see run_model
+        self.steps_to_clear = None
        
 
         # Check if the width is divisible by 3, otherwise throw an error
@@ -47,27 +221,36 @@ class RadioactiveEnv(mesa.Model):
         self.zone_locations = {'green':(0, self.width//3),
             'yellow':(self.width//3, self.width*2//3),
             'red':(self.width*2//3, self.width)}
+        # Red robots dispose of the wastes in the last column
+        self.disposal_x = self.zone_locations['red'][1] - 1
+
+        # Waste counters kept up to date by the waste handling methods
+        # Wastes carried by robots, by (robot colour, waste colour)
+        self.waste_carried = Counter()
+        # Wastes lying in the disposal column
+        self.waste_disposed = 0
         
-        # Setup the data collector
-        self.datacollector = mesa.DataCollector(
-            {
-                "Waste": lambda m: m.schedule.get_type_count(Waste)
-            }
-        )
+        # Setup the data collector, in memory unless the metrics are streamed to disk
+        self.datacollector = mesa.DataCollector(MODEL_REPORTERS)
+        self.metrics_stream = None
+        if metrics_path is not None:
+            self.metrics_stream = StreamingCollector(
+                metrics_path, MODEL_REPORTERS, ROBOT_REPORTERS, agent_type=Robot,
+                chunk_size=metrics_chunk_size, format=metrics_format)
         
         # Initiliase the map
-        self.grid = mesa.space.MultiGrid(self.width, self.height, torus=False)
+        self.grid = VersionedMultiGrid(self.width, self.height, torus=False)
+        self.incremental_percepts = incremental_percepts
+        # Zone colour of every cell, stored as a raster rather than as tile agents
+        self.zones = ZoneRaster(self.width, self.height, self.zone_locations)
+        # Wastes on the grid by colour and position
+        self.waste_index = WasteIndex()
+        # Zone restricted neighbourhoods, reused by do() on every step
+        self.neighbourhoods = NeighbourhoodTable(self.width, self.height)
 
-        # Place wastes, robots and tiles on the grid
+        # Place wastes and robots on the grid
         for zone_key, zone_value in self.zone_locations.items():
 
-            # Fill each zone with tiles of its colour 
-            for x in range(zone_value[0], zone_value[1]):
-                for y in range(self.height):
-                    tile = Grid_Tile(self.next_id(), (x, y), self, colour=zone_key)
-                    self.grid.place_agent(tile, (x, y))
-                    self.schedule.add(tile)
-
             # Add the wastes to the zone
             for i in range(self.initial_wastes_per_zone):
                 # TODO - check if the cell is already occupied
@@ -75,8 +258,7 @@ class RadioactiveEnv(mesa.Model):
                 x = self.random.randrange(zone_value[0], zone_value[1])
                 y = self.random.randrange(self.height)
                 waste = Waste(self.next_id(), (x, y), self, colour=zone_key)
-                self.grid.place_agent(waste, (x, y))
-                self.schedule.add(waste)
+                self.place_waste(waste, (x, y))
             
             # Add the robot to the zone
             for i in range(self.initial_robots_per_zone):
@@ -87,82 +269,161 @@ class RadioactiveEnv(mesa.Model):
                 robot = Robot(self.next_id(), (x, y), self,zone_value, True,colour=zone_key)
                 self.grid.place_agent(robot, (x, y))
                 self.schedule.add(robot)
+                self.message_service.subscribe(robot_topic(zone_key), robot)
 
         
+    def reset_randomizer(self, seed=None):
+        '''
+            Reseed the model stream and the robot streams derived from it
+        '''
+        super().reset_randomizer(seed)
+        for robot in self.schedule.get_agents_of_type(Robot):
+            robot.reset_randomizer()
+
+    def get_zone(self, pos):
+        '''
+            Return the colour of the zone containing pos
+        '''
+        return self.zones.get_zone(pos)
+
+    def place_waste(self, waste, pos):
+        '''
+            Put a waste on the grid and in the schedule, and index it
+        '''
+        self.grid.place_agent(waste, pos)
+        self.schedule.add(waste)
+        self.waste_index.add(waste, pos)
+        if pos[0] == self.disposal_x:
+            self.waste_disposed += 1
+
+    def remove_waste(self, waste):
+        '''
+            Take a waste off the grid and out of the schedule, and unindex it
+        '''
+        self.waste_index.remove(waste, waste.pos)
+        if waste.pos[0] == self.disposal_x:
+            self.waste_disposed -= 1
+        self.grid.remove_agent(waste)
+        self.schedule.remove(waste)
+
     def do(self, agent, action):
         '''
             Take the action determined and return an observation
         '''
+        pickedup_waste = self.apply_action(agent, action)
+        return self.perceive(agent, pickedup_waste)
+
+    def apply_action(self, agent, action):
+        '''
+            Carry out the action of a robot
+            A PickUp finding no waste, e.g. taken by a robot acting before, does nothing
+            Return: True if the action was a PickUp
+        '''
+        profiler = self.profiler
+        # Only named for the profiler, a disabled one ignores it
+        agent_type = type(agent).__name__ if profiler.enabled else None
         #  =====  Do the action  =========
         # Check if the action is a movement
         movement, handlewaste = action
         pickedup_waste = False
-        if movement != None:
-            self.grid.move_agent(agent, movement)
-        if handlewaste != None:
-            # Do the waste handling
-            if handlewaste == 'PickUp':
-                pickedup_waste =True
-                self.collect_waste(agent)
-            elif handlewaste == 'Transform':
-                self.transform_waste(agent)
-            elif handlewaste == 'DropOff': # only for red robot
-                self.drop_waste(agent)
-            elif handlewaste == 'DropOffandSendMessage':
-                self.drop_waste(agent)
-                # Send a message to the other robots to let them know that the waste has been dropped off
-                self.inform_waste_location(agent)
-               
+        with profiler.phase('do.act', agent_type):
+            if movement != None:
+                previous_pos = agent.pos
+                self.grid.move_agent(agent, movement)
+                if self.trace.level >= DEBUG:
+                    self.trace.record(self.schedule.steps, EventKind.MOVE, agent.unique_id, movement, *previous_pos)
+            if handlewaste != None:
+                if profiler.enabled:
+                    profiler.count(f'action.{handlewaste}', agent_type=agent_type)
+                # Do the waste handling
+                if handlewaste == 'PickUp':
+                    pickedup_waste =True
+                    self.collect_waste(agent)
+                elif handlewaste == 'Transform':
+                    self.transform_waste(agent)
+                elif handlewaste == 'DropOff': # only for red robot
+                    self.drop_waste(agent)
+                elif handlewaste == 'DropOffandSendMessage':
+                    self.drop_waste(agent)
+                    # Send a message to the other robots to let them know that the waste has been dropped off
+                    self.inform_waste_location(agent)
+        return pickedup_waste
 
+    def perceive(self, agent, pickedup_waste=False):
+        '''
+            Build the percept of a robot, reading its new messages on the way
+        '''
+        profiler = self.profiler
+        agent_type = type(agent).__name__ if profiler.enabled else None
         #  ====== Get the info needed for percept  =======
         # Neighbour tuple list
         current_pos = agent.pos
-        neighbours = []
-        # All neighbours in grid
-        all_neighbours = list(self.grid.get_neighborhood(current_pos, True, True)) #check moore
-        # Restric to the robot's zone
-        # Restrict the robot to it's zones
-        restricted_neighbours = []
-        for cell in all_neighbours:
-            if cell[0] in range(0,agent.x_range[1]):
-                restricted_neighbours.append(cell)
-
-        # Look at contents of the restrcited neighbours
-        for cell in restricted_neighbours:
-            cell_contents = self.grid.get_cell_list_contents(cell)
-            neighbours.append((cell, cell_contents))
+        neighbours = None
+        changed_cells = None
+        with profiler.phase('do.neighbourhood', agent_type):
+            # Neighbours in grid restricted to the robot's zone, from the precomputed table
+            restricted_neighbours = self.neighbourhoods.get(current_pos, agent.x_range[1])
+
+            if self.incremental_percepts:
+                # Only the cells changed since the robot last saw them
+                changed_cells = self.observe_cells(agent, restricted_neighbours)
+            else:
+                # Look at contents of the restrcited neighbours
+                neighbours = []
+                for cell in restricted_neighbours:
+                    cell_contents = self.grid.get_cell_list_contents(cell)
+                    neighbours.append((cell, cell_contents))
+
+        with profiler.phase('do.waste_lookup', agent_type):
+            waste_here = False
+            nearby_waste = None
+            if changed_cells is None:
+                # Wastes of the robot's colour here and in the restricted neighbourhood, from the index
+                # (incremental percepts: the robot finds them in its cells, see agents.update)
+                waste_here = self.waste_index.has_waste(current_pos, agent.colour)
+                nearby_waste = self.waste_index.nearest(
+                    current_pos, agent.colour, 1, x_limit=agent.x_range[1], exclude_x=agent.x_range[1]-1)
 
         # Get the waste list so it can be added to the percepts
         waste_list = agent.waste_list
-        # Get the waste location send to store after
-        waste_location = None
-        # check messages 
-        new_messages = agent.get_new_messages()
-        if len(new_messages) != 0:
-            print("y a des messages")
-            for message in new_messages:
-                if message.get_performative() == MessagePerformative.INFORM_REF:
-                    waste_location = message.get_content()
-                    print('Waste location received from message: ', waste_location)
-                
+        # check messages, get the waste locations send to store after
+        with profiler.phase('do.handle_messages', agent_type):
+            waste_locations = self.handle_messages(agent)
+
         # Build percept object to be sent to agent
-        percept = Percept(neighbours, current_pos, waste_list,waste_location,pickedup_waste)
+        percept = Percept(neighbours, current_pos, waste_list,waste_locations,pickedup_waste,
+                          waste_here, nearby_waste, restricted_neighbours, changed_cells)
 
         return percept
 
+    def observe_cells(self, agent, cells):
+        '''
+            Cells changed since the robot last saw them, for the incremental percepts
+            agent.cell_versions only keeps the given cells, see VersionedMultiGrid.changed_cells
+            Return: list of (cell_location, waste of the robot's colour on the cell)
+        '''
+        changed = self.grid.changed_cells(cells, agent.cell_versions)
+        if not changed:
+            return NO_CHANGES
+        has_waste = self.waste_index.has_waste
+        colour = agent.colour
+        return [(cell, has_waste(cell, colour)) for cell in changed]
+
     def collect_waste(self, agent):
         '''
             Add the waste to the robot's waste list if it is on the same cell
             Return the current waste list
         '''
         # Add waste to the agent's list if it is on the same cell
-        if isinstance(agent, Robot):            
-            cellmates = self.grid.get_cell_list_contents([agent.pos])
-            for cellmate in cellmates:
-                if isinstance(cellmate, Waste) and agent.colour == cellmate.colour:
-                    agent.waste_list.append(cellmate)
-                    self.grid.remove_agent(cellmate)
-                    self.schedule.remove(cellmate)
+        if isinstance(agent, Robot):
+            # Copy, the index entry shrinks as the wastes are removed
+            for waste in list(self.waste_index.wastes_at(agent.pos, agent.colour)):
+                agent.waste_list.append(waste)
+                self.remove_waste(waste)
+                self.waste_carried[agent.colour, waste.colour] += 1
+                if self.trace.level >= INFO:
+                    self.trace.record(self.schedule.steps, EventKind.PICKUP, agent.unique_id, agent.pos,
+                                      waste.unique_id, colour_code(waste.colour))
         
     
     def transform_waste(self, agent):
@@ -172,52 +433,215 @@ class RadioactiveEnv(mesa.Model):
             If green, transform to yellow
             If yellow, transform to red
         '''
-        print('Transforming waste')
-        print('Current waste list: ', agent.waste_list)
+        # The wastes are carried, not on the grid, so the waste index is not affected
 
-        agent.waste_list.pop(0)
+        removed = agent.waste_list.pop(0)
+        self.waste_carried[agent.colour, removed.colour] -= 1
+        self.waste_carried[agent.colour, agent.waste_list[0].colour] -= 1
         if agent.waste_list[0].colour == 'green':
             agent.waste_list[0].colour = 'yellow'
         elif agent.waste_list[0].colour == 'yellow':
             agent.waste_list[0].colour = 'red'
-
-        print('New waste list: ', agent.waste_list)
+        self.waste_carried[agent.colour, agent.waste_list[0].colour] += 1
+        if self.trace.level >= INFO:
+            self.trace.record(self.schedule.steps, EventKind.TRANSFORM, agent.unique_id, agent.pos,
+                              removed.unique_id, colour_code(agent.waste_list[0].colour))
 
     def drop_waste(self, agent):
         '''
             Add the current waste to the grid at the current location, and delete it from the wastelist
         '''
         waste = agent.waste_list.pop(0)
-        self.grid.place_agent(waste, agent.pos)
-        self.schedule.add(waste)
+        self.waste_carried[agent.colour, waste.colour] -= 1
+        self.place_waste(waste, agent.pos)
+        if self.trace.level >= INFO:
+            self.trace.record(self.schedule.steps, EventKind.DROP, agent.unique_id, agent.pos,
+                              waste.unique_id, colour_code(waste.colour))
+
+    def send_message(self, agent, message):
+        '''
+            Send a message on behalf of agent and trace it
+        '''
+        agent.send_message(message)
+        if self.trace.level >= INFO:
+            receiver = message.get_dest()
+            self.trace.record(self.schedule.steps, EventKind.MESSAGE_SENT, agent.unique_id, agent.pos,
+                              message.get_performative().value, receiver if isinstance(receiver, int) else -1)
         
     def inform_waste_location(self, agent):
         '''
-            green robot sends a message to the yellow robot
-            yellow robot sends a message to the red robot
-        '''
-        if agent.colour == 'yellow' :
-            # send a message to the red robot
-            for target_agent in self.schedule.agents:
-                if isinstance(target_agent, Robot) and target_agent.colour == 'red':
-                    message = Message(agent.colour ,target_agent.colour, MessagePerformative.INFORM_REF, agent.pos)
-                    agent.send_message(message) # message send to red 
-                    print('Message sent from yellow to red robot')
-                
-        if agent.colour == 'green':
-            for target_agent in self.schedule.agents:
-                if isinstance(target_agent, Robot) and target_agent.colour == 'yellow':
-                    message = Message(agent.colour,target_agent.colour , MessagePerformative.INFORM_REF, agent.pos)
-                    agent.send_message(message) # message send to red 
-                    print('Message sent from green to yellow robot')
+            Call for proposals on the dropped waste (contract net)
+            green robot publishes a PROPOSE to the yellow robots topic
+            yellow robot publishes a PROPOSE to the red robots topic
+            They bid with an ACCEPT, and the best bidder gets a COMMIT, see handle_messages
+        '''
+        if agent.colour in NEXT_COLOUR:
+            # Announcements are told apart by the step they are made at, a robot drops at most one waste per step
+            announcement = (agent.pos, self.schedule.steps)
+            message = Message(agent.unique_id, robot_topic(NEXT_COLOUR[agent.colour]), MessagePerformative.PROPOSE, announcement)
+            self.send_message(agent, message)
+
+    def handle_messages(self, agent):
+        '''
+            Read the robot's new messages and play its part in the contract net:
+            PROPOSE: bid for the announced waste with an ACCEPT
+            ACCEPT: (as the robot which dropped the waste) award the announcement to the best bid with a COMMIT,
+                each announcement is awarded on its own, even when several were made on the same cell
+            COMMIT: the robot now has to collect the waste
+            Return: the waste locations the robot committed to
+        '''
+        waste_locations = []
+        best_bids = {}
+        new_messages = agent.get_new_messages()
+        if self.profiler.enabled:
+            self.profiler.count('messages_read', len(new_messages), type(agent).__name__)
+        for message in new_messages:
+            performative = message.get_performative()
+            if self.trace.level >= INFO:
+                self.trace.record(self.schedule.steps, EventKind.MESSAGE_READ, agent.unique_id, agent.pos,
+                                  performative.value, message.get_exp())
+            if performative == MessagePerformative.PROPOSE:
+                announcement = message.get_content()
+                offer = bid(agent.knowledge, agent.pos, announcement[0])
+                self.send_message(agent, Message(agent.unique_id, message.get_exp(), MessagePerformative.ACCEPT, (announcement, offer)))
+            elif performative == MessagePerformative.ACCEPT:
+                announcement, offer = message.get_content()
+                # Lowest bid wins, ties go to the lowest unique_id
+                candidate = (offer, message.get_exp())
+                if announcement not in best_bids or candidate < best_bids[announcement]:
+                    best_bids[announcement] = candidate
+            elif performative in (MessagePerformative.COMMIT, MessagePerformative.INFORM_REF):
+                waste_locations.append(message.get_content())
+
+        for (location, _), (offer, bidder) in best_bids.items():
+            self.send_message(agent, Message(agent.unique_id, bidder, MessagePerformative.COMMIT, location))
+
+        return waste_locations
 
-            
-        
     def step(self):
-        self.__messages_service.dispatch_messages()
-        self.schedule.step()
+        profiler = self.profiler
+        with profiler.phase('dispatch_messages'):
+            self.message_service.dispatch_messages()
+        with profiler.phase('schedule.step'):
+            if self.step_mode == 'synchronous':
+                self.step_synchronous()
+            else:
+                self.schedule.step()
         # collect data
-        self.datacollector.collect(self)
+        with profiler.phase('collect'):
+            if self.metrics_stream is not None:
+                self.metrics_stream.collect(self)
+            else:
+                self.datacollector.collect(self)
+        profiler.end_step()
+
+    def step_synchronous(self):
+        '''
+            Step all the robots on the same state of the grid:
+            - every robot updates its knowledge with its last percept
+            - they all deliberate, in parallel with a deliberation_executor
+            - the actions are applied one robot at a time, in a random order drawn from the
+              model stream: the first robot to pick up a contested waste gets it, the PickUp
+              of the next ones does nothing
+            - every robot perceives the result
+            Random moves draw from a per step stream of each robot, see agents.StepRandom
+        '''
+        profiler = self.profiler
+        step = self.schedule.steps
+        robots = list(self.schedule.get_agents_of_type(Robot))
+        self.random.shuffle(robots)
+        with profiler.phase('sync.sense'):
+            ready = [robot for robot in robots if robot.sense()]
+        with profiler.phase('sync.deliberate'):
+            actions = self.deliberation_pool.map([
+                (robot.knowledge, StepRandom(f'{agent_seed(self._seed, robot.unique_id)}/{step}'))
+                for robot in ready])
+        action_of = dict(zip(ready, actions))
+        with profiler.phase('sync.apply'):
+            pickedup = [self.apply_action(robot, action_of.get(robot, (None, None))) for robot in robots]
+        with profiler.phase('sync.perceive'):
+            for robot, pickedup_waste in zip(robots, pickedup):
+                robot.percepts = self.perceive(robot, pickedup_waste)
+        self.schedule.advance_clock()
+
+    def close(self):
+        '''
+            Stop the deliberation pool and the message transport, write the buffered metrics and trace
+        '''
+        self.deliberation_pool.close()
+        self.message_service.close()
+        if self.metrics_stream is not None:
+            self.metrics_stream.close()
+        self.trace.flush()
+
+    def robot_loads(self):
+        '''
+            Return: (robot colour, colours of the carried wastes) of the robots carrying wastes
+        '''
+        return [
+            (robot.colour, [waste.colour for waste in robot.waste_list])
+            for robot in self.schedule.get_agents_of_type(Robot)
+            if robot.waste_list
+        ]
+
+    def is_cleared(self):
+        '''
+            True when every waste on the grid has reached the disposal column and the
+            robots only carry stranded wastes, see stranded_wastes
+        '''
+        if self.schedule.get_type_count(Waste) != self.waste_disposed:
+            return False
+        for (robot_colour, waste_colour), count in self.waste_carried.items():
+            if count > 0 and (waste_colour != robot_colour or robot_colour == 'red'):
+                return False
+        # Only then look at what each robot carries
+        return stranded_wastes(self.robot_loads()) is not None
+
+    def get_metrics(self):
+        '''
+            Summary of the run so far
+            Remaining wastes are counted by colour, on the grid or carried by robots,
+            the stranded ones are counted apart once the grid is cleared, see stranded_wastes
+        '''
+        waste_remaining = {
+            colour: self.schedule.get_type_colour_count(Waste, colour) for colour in self.zone_locations
+        }
+        waste_remaining['red'] -= self.waste_disposed
+        for (robot_colour, waste_colour), count in self.waste_carried.items():
+            waste_remaining[waste_colour] += count
+        stranded = Counter()
+        if self.is_cleared():
+            stranded = stranded_wastes(self.robot_loads())
+        for colour in waste_remaining:
+            waste_remaining[colour] -= stranded[colour]
+        return {
+            'steps': self.schedule.steps,
+            'steps_to_clear': self.steps_to_clear,
+            'waste_remaining': waste_remaining,
+            'waste_stranded': {colour: stranded[colour] for colour in self.zone_locations},
+            'waste_disposed': self.waste_disposed,
+            'messages_sent': self.message_service.get_sent_count(),
+        }
+
+    def get_message_statistics(self):
+        '''
+            Counters and histograms of the messages so far, see MessageService.get_statistics
+        '''
+        return self.message_service.get_statistics()
 
     def run_model(self, step_count=200):
-        pass
+        '''
+            Run headless until the grid is cleared or step_count steps have been done
+            Return: the summary metrics of get_metrics
+        '''
+        for _ in range(step_count):
+            if self.is_cleared():
+                break
+            self.step()
+        if self.steps_to_clear is None and self.is_cleared():
+            self.steps_to_clear = self.schedule.steps
+            self.running = False
+        if self.metrics_stream is not None:
+            self.metrics_stream.flush()
+        self.trace.flush()
+        return self.get_metrics()
@@ -0,0 +1,50 @@
+class NeighbourhoodTable():
+    """
+    Precomputed Moore neighbourhoods (centre included) restricted to a robot's zone
+
+    Equivalent to grid.get_neighborhood(pos, True, True) filtered on x < x_limit,
+    in the same order, but computed once per cell and reused on every step.
+    Neighbourhoods only differ from the unrestricted one on the column x_limit - 1,
+    so one table is shared by all zones plus a column per zone limit.
+    Entries are built lazily, the first time a cell is looked at.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # One tuple per cell, shared by all the neighbourhoods containing it
+        self._cells = [(x, y) for x in range(width) for y in range(height)]
+        self._full = [None] * (width * height)
+        # x_limit -> neighbourhoods of the column x_limit - 1
+        self._edges = {}
+
+    def _build(self, x, y, x_limit):
+        cells = self._cells
+        height = self.height
+        return tuple(
+            cells[nx * height + ny]
+            for nx in range(x - 1, x + 2)
+            for ny in range(y - 1, y + 2)
+            if 0 <= nx < x_limit and 0 <= ny < height
+        )
+
+    def get(self, pos, x_limit):
+        '''
+            Return the neighbourhood of pos restricted to x < x_limit (do not modify it)
+        '''
+        x, y = pos
+        if x + 1 < x_limit or x_limit >= self.width:
+            index = x * self.height + y
+            neighbourhood = self._full[index]
+            if neighbourhood is None:
+                neighbourhood = self._full[index] = self._build(x, y, self.width)
+            return neighbourhood
+        if x + 1 == x_limit:
+            edge = self._edges.get(x_limit)
+            if edge is None:
+                edge = self._edges[x_limit] = [None] * self.height
+            neighbourhood = edge[y]
+            if neighbourhood is None:
+                neighbourhood = edge[y] = self._build(x, y, x_limit)
+            return neighbourhood
+        # Outside the zone, not expected for robots
+        return self._build(x, y, x_limit)
@@ -0,0 +1,74 @@
+"""
+Parallel deliberation for the synchronous step mode
+
+In a synchronous step every robot deliberates on the same state of the grid,
+so deliberate() can run for many robots at once. DeliberationPool splits the
+robots into batches and runs them in a thread or process pool. The actions
+are returned in the order of the robots, whatever the pool, so the run only
+depends on the seed.
+
+Processes receive detached knowledge bases (see agents.detach), the knowledge
+of the model's robots holds references to the whole model.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .agents import deliberate, detach
+
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+}
+
+
+def deliberate_batch(batch):
+    '''
+        Return: the actions of a batch of (knowledge, rng) pairs
+    '''
+    return [deliberate(knowledge, rng) for knowledge, rng in batch]
+
+
+class DeliberationPool():
+    """
+        Run deliberate() for batches of robots in the calling thread, a thread pool or a process pool
+    """
+    def __init__(self, kind=None, workers=None, batch_size=256):
+        '''
+            kind: None to deliberate in the calling thread, 'thread' or 'process'
+            workers: size of the pool, the number of cores by default
+            batch_size: number of robots deliberated per task
+        '''
+        if kind is not None and kind not in EXECUTORS:
+            raise ValueError(f"Unknown executor {kind}, expected None or one of {sorted(EXECUTORS)}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._executor = None
+
+    def __getstate__(self):
+        # The pool is started again on first use after a restore
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+    def map(self, items):
+        '''
+            items: list of (knowledge, rng) pairs
+            Return: the list of their actions, in the same order
+        '''
+        if self.kind is None or len(items) <= self.batch_size:
+            return deliberate_batch(items)
+        if self.kind == 'process':
+            items = [(detach(knowledge), rng) for knowledge, rng in items]
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        if self._executor is None:
+            self._executor = EXECUTORS[self.kind](max_workers=self.workers)
+        actions = []
+        for batch_actions in self._executor.map(deliberate_batch, batches):
+            actions.extend(batch_actions)
+        return actions
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,12 +1,33 @@
+def without_contents(neighbours):
+    '''
+        Neighbours with the cell contents dropped, None stays None
+        The contents are the model's agents, which reference each other through their own
+        percepts and knowledge, copying or pickling them would follow that chain
+    '''
+    if neighbours is None:
+        return None
+    return [(cell, []) for cell, _ in neighbours]
 
 
 class Percept():
-    def __init__(self, neighbours, current_pos, waste_list,received_waste_location,pickedup_waste):
-        self.neighbours = neighbours # List of tuples (cell_location, cell_contents)
+    def __init__(self, neighbours, current_pos, waste_list,received_waste_locations,pickedup_waste,
+                 waste_here=False, nearby_waste=None,
+                 neighbour_cells=None, changed_cells=None):
+        self.neighbours = neighbours # List of tuples (cell_location, cell_contents), None for incremental percepts
         self.current_pos = current_pos # Equiv of base_cells
         self.waste_list = waste_list
-        self.received_waste_location = received_waste_location  
+        self.received_waste_locations = received_waste_locations # Locations of the wastes the robot committed to
         self.pickedup_waste = pickedup_waste 
+        self.waste_here = waste_here # Waste of the robot's colour on its cell
+        self.nearby_waste = nearby_waste # Nearest reachable cell with waste of the robot's colour, or None
+        self.neighbour_cells = neighbour_cells # Cell locations of the neighbourhood (shared, do not modify)
+        # Incremental percepts only: (cell_location, waste of the robot's colour on the cell) of the
+        # neighbours changed since the robot last saw them, None for full percepts
+        self.changed_cells = changed_cells
         # TODO: waste position
 
-
+    def __getstate__(self):
+        # Copies and pickles don't keep the cell contents, see without_contents
+        state = self.__dict__.copy()
+        state['neighbours'] = without_contents(self.neighbours)
+        return state
@@ -0,0 +1,175 @@
+"""
+Built-in step profiling
+
+StepProfiler keeps monotonic timers and counters per phase and per agent type.
+It is disabled by default and can be switched on and off at any time through
+its enabled attribute, a disabled profiler only costs an attribute check.
+
+Example:
+>>> model = RadioactiveEnv(profile=True)
+>>> model.run_model(500)
+>>> print(model.profiler.report())
+>>> model.profiler.add_exporter(json_lines_exporter('profile.jsonl'), every=100)
+"""
+import json
+import time
+from collections import Counter
+
+
+class _Timer():
+    """
+        Context manager adding the time spent in its block to a phase
+    """
+    __slots__ = ('profiler', 'key', 'start')
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.key[0], time.perf_counter_ns() - self.start, self.key[1])
+        return False
+
+
+class _NullTimer():
+    """
+        Shared timer of a disabled profiler, does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class StepProfiler():
+    """
+        Timers and counters per (phase, agent type)
+
+        The agent type is a name, e.g. 'Robot', or None for the model level phases.
+        Times are in nanoseconds of time.perf_counter_ns.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        # (phase, agent type) -> [calls, total ns, max ns]
+        self.timings = {}
+        # (name, agent type) -> count
+        self.counters = Counter()
+        self.steps = 0
+        # [callback, every] pairs, see add_exporter
+        self._exporters = []
+
+    def __getstate__(self):
+        # Exporters usually hold files or closures, a restored profiler starts without them
+        state = self.__dict__.copy()
+        state['_exporters'] = []
+        return state
+
+    def phase(self, name, agent_type=None):
+        '''
+            Return: a context manager timing its block as the phase name
+        '''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, (name, agent_type))
+
+    def add(self, name, elapsed, agent_type=None):
+        '''
+            Add elapsed nanoseconds to the phase name
+        '''
+        timing = self.timings.get((name, agent_type))
+        if timing is None:
+            self.timings[name, agent_type] = [1, elapsed, elapsed]
+        else:
+            timing[0] += 1
+            timing[1] += elapsed
+            if elapsed > timing[2]:
+                timing[2] = elapsed
+
+    def count(self, name, value=1, agent_type=None):
+        if self.enabled:
+            self.counters[name, agent_type] += value
+
+    def end_step(self):
+        '''
+            Called by the model after each step, runs the exporters that are due
+        '''
+        if not self.enabled:
+            return
+        self.steps += 1
+        for callback, every in self._exporters:
+            if every and self.steps % every == 0:
+                callback(self.snapshot())
+
+    def add_exporter(self, callback, every=None):
+        '''
+            callback(snapshot) is called every `every` profiled steps, and by export()
+        '''
+        self._exporters.append([callback, every])
+
+    def remove_exporter(self, callback):
+        self._exporters = [exporter for exporter in self._exporters if exporter[0] is not callback]
+
+    def export(self):
+        '''
+            Send the current snapshot to every exporter
+        '''
+        snapshot = self.snapshot()
+        for callback, _ in self._exporters:
+            callback(snapshot)
+
+    def reset(self):
+        self.timings.clear()
+        self.counters.clear()
+        self.steps = 0
+
+    def snapshot(self):
+        '''
+            Return: a JSON serialisable summary of the timers and counters
+        '''
+        return {
+            'steps': self.steps,
+            'timings': [
+                {'phase': name, 'agent_type': agent_type, 'calls': calls, 'total_ns': total, 'max_ns': longest}
+                for (name, agent_type), (calls, total, longest) in self.timings.items()
+            ],
+            'counters': [
+                {'name': name, 'agent_type': agent_type, 'count': count}
+                for (name, agent_type), count in self.counters.items()
+            ],
+        }
+
+    def report(self):
+        '''
+            Return: the timers sorted by total time, then the counters, as text
+        '''
+        lines = [f'{"phase":<32}{"agent type":<12}{"calls":>10}{"total ms":>12}{"mean us":>10}{"max us":>10}']
+        for (name, agent_type), (calls, total, longest) in sorted(
+                self.timings.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f'{name:<32}{agent_type or "-":<12}{calls:>10}{total / 1e6:>12.2f}'
+                         f'{total / calls / 1e3:>10.1f}{longest / 1e3:>10.1f}')
+        if self.counters:
+            lines.append('')
+            lines.append(f'{"counter":<32}{"agent type":<12}{"count":>10}')
+            for (name, agent_type), count in sorted(self.counters.items(), key=lambda item: str(item[0])):
+                lines.append(f'{name:<32}{agent_type or "-":<12}{count:>10}')
+        return '\n'.join(lines)
+
+
+def json_lines_exporter(path):
+    '''
+        Return: an exporter appending each snapshot to path as one JSON line
+    '''
+    def export(snapshot):
+        with open(path, 'a') as output:
+            output.write(json.dumps(snapshot) + '\n')
+    return export
@@ -1,4 +1,5 @@
-from typing import Callable, Optional, Type
+from collections import Counter
+from typing import Callable, Iterable, Optional, Type
 
 import mesa
 
@@ -8,11 +9,157 @@ class RandomActivationByTypeFiltered(mesa.time.RandomActivationByType):
     A scheduler that overrides the get_type_count method to allow for filtering
     of agents by a function before counting.
 
+    Observers registered with add_observer are notified whenever an agent is
+    added to or removed from the schedule, so that indexes built on top of the
+    scheduler (e.g. the MessageService name registry) stay in sync.
+
+    Counts per type and per (type, colour) are kept up to date on add and
+    remove, so unfiltered counts are O(1). The colour is the agent's colour
+    attribute when it is added, agents must not change colour while scheduled.
+
+    Agent types or single agents can be marked passive: they are tracked for
+    counting and lookup, but never shuffled or stepped, so the cost of a step
+    only depends on the active agents.
+
     Example:
     >>> scheduler = RandomActivationByTypeFiltered(model)
     >>> scheduler.get_type_count(AgentA, lambda agent: agent.some_attribute > 10)
+    >>> scheduler = RandomActivationByTypeFiltered(model, passive_types=(Obstacle,))
     """
 
+    def __init__(self, model: mesa.Model, passive_types: Iterable[Type[mesa.Agent]] = ()) -> None:
+        super().__init__(model)
+        self._observers = []
+        self._passive_types = set(passive_types)
+        # unique_id of the agents marked passive one by one
+        self._passive_ids = set()
+        # unique_id -> agent, scheduled passive agents, kept out of the mesa schedule
+        self._passive_agents = {}
+        # type -> {unique_id: agent}
+        self._agents_of_type = {}
+        self._type_counts = Counter()
+        self._type_colour_counts = Counter()
+        # AgentSet of all the scheduled agents, built on demand, None when it is out of date
+        self._all_agents = None
+
+    def add_observer(self, observer) -> None:
+        """
+        Register an object exposing agent_added(agent) and agent_removed(agent).
+        """
+        self._observers.append(observer)
+
+    def remove_observer(self, observer) -> None:
+        """
+        Stop notifying the given observer.
+        """
+        self._observers.remove(observer)
+
+    def is_passive(self, agent: mesa.Agent) -> bool:
+        """
+        True if the agent's type or the agent itself is marked passive.
+        """
+        return type(agent) in self._passive_types or agent.unique_id in self._passive_ids
+
+    def _is_scheduled(self, agent: mesa.Agent) -> bool:
+        return agent.unique_id in self._agents_of_type.get(type(agent), {})
+
+    def _set_activity(self, agent: mesa.Agent, was_passive: bool) -> None:
+        """
+        Move a scheduled agent between the mesa schedule and the passive agents.
+        """
+        passive = self.is_passive(agent)
+        if passive == was_passive or not self._is_scheduled(agent):
+            return
+        self._all_agents = None
+        if passive:
+            super().remove(agent)
+            self._passive_agents[agent.unique_id] = agent
+        else:
+            del self._passive_agents[agent.unique_id]
+            super().add(agent)
+
+    def set_passive(self, agent: mesa.Agent, passive: bool = True) -> None:
+        """
+        Mark or unmark a single agent as passive, the mark is kept if it is removed and added again.
+        """
+        was_passive = self.is_passive(agent)
+        if passive:
+            self._passive_ids.add(agent.unique_id)
+        else:
+            self._passive_ids.discard(agent.unique_id)
+        self._set_activity(agent, was_passive)
+
+    def set_passive_type(self, type_class: Type[mesa.Agent], passive: bool = True) -> None:
+        """
+        Mark or unmark every agent of a type as passive.
+        """
+        agents = list(self.get_agents_of_type(type_class))
+        was_passive = [self.is_passive(agent) for agent in agents]
+        if passive:
+            self._passive_types.add(type_class)
+        else:
+            self._passive_types.discard(type_class)
+        for agent, agent_was_passive in zip(agents, was_passive):
+            self._set_activity(agent, agent_was_passive)
+
+    @property
+    def agents(self) -> mesa.agent.AgentSet:
+        """
+        All the scheduled agents, passive ones included.
+        The set is cached until an agent is added or removed, do not modify it.
+        """
+        if self._all_agents is None:
+            self._all_agents = mesa.agent.AgentSet(
+                list(self._agents) + list(self._passive_agents.values()), self.model)
+        return self._all_agents
+
+    def get_agent_count(self) -> int:
+        return len(self._agents) + len(self._passive_agents)
+
+    def add(self, agent: mesa.Agent) -> None:
+        if self.is_passive(agent):
+            if agent.unique_id in self._passive_agents:
+                raise ValueError("agent already added to scheduler")
+            self._passive_agents[agent.unique_id] = agent
+        else:
+            super().add(agent)
+        self._all_agents = None
+        agent_type = type(agent)
+        self._agents_of_type.setdefault(agent_type, {})[agent.unique_id] = agent
+        self._type_counts[agent_type] += 1
+        self._type_colour_counts[agent_type, getattr(agent, "colour", None)] += 1
+        for observer in self._observers:
+            observer.agent_added(agent)
+
+    def remove(self, agent: mesa.Agent) -> None:
+        if agent.unique_id in self._passive_agents:
+            del self._passive_agents[agent.unique_id]
+        else:
+            super().remove(agent)
+        self._all_agents = None
+        agent_type = type(agent)
+        del self._agents_of_type[agent_type][agent.unique_id]
+        self._type_counts[agent_type] -= 1
+        self._type_colour_counts[agent_type, getattr(agent, "colour", None)] -= 1
+        for observer in self._observers:
+            observer.agent_removed(agent)
+
+    def advance_clock(self) -> None:
+        """
+        Count a step the model ran itself instead of calling step(), e.g. a synchronous step.
+        mesa wraps the scheduler's step() (not Model.step) to advance the model's clock,
+        so it is advanced here exactly once, as a wrapped step() would.
+        """
+        self.steps += 1
+        self.time += 1
+        self.model._advance_time()
+
+    def get_agents_of_type(self, type_class: Type[mesa.Agent]):
+        """
+        Returns a view of the agents of certain type in the queue.
+        """
+        return self._agents_of_type.get(type_class, {}).values()
+
     def get_type_count(
         self,
         type_class: Type[mesa.Agent],
@@ -21,11 +168,18 @@ class RandomActivationByTypeFiltered(mesa.time.RandomActivationByType):
         """
         Returns the current number of agents of certain type in the queue
         that satisfy the filter function.
+        Without a filter function the count is read from the counters.
         """
-        if type_class not in self.agents_by_type:
-            return 0
+        if filter_func is None:
+            return self._type_counts[type_class]
         count = 0
-        for agent in self.agents_by_type[type_class].values():
-            if filter_func is None or filter_func(agent):
+        for agent in self._agents_of_type.get(type_class, {}).values():
+            if filter_func(agent):
                 count += 1
         return count
+
+    def get_type_colour_count(self, type_class: Type[mesa.Agent], colour) -> int:
+        """
+        Returns the current number of agents of certain type and colour in the queue.
+        """
+        return self._type_colour_counts[type_class, colour]
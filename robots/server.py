@@ -1,5 +1,7 @@
 import mesa
-from robots.agents import Waste, Robot, Grid_Tile
+from collections import defaultdict
+
+from robots.agents import Waste, Robot
 from robots.model import RadioactiveEnv
 
 
@@ -9,14 +11,7 @@ def wolf_sheep_portrayal(agent):
 
     portrayal = {}
 
-    if type(agent) is Grid_Tile:
-        portrayal["Shape"] = f"robots/resources/tile_{agent.colour}.png"
-        # https://icons8.com/web-app/36821/German-Shepherd
-        portrayal["scale"] = 0.9
-        portrayal["Layer"] = 0
-        portrayal["text_color"] = "Black"
-
-    elif type(agent) is Waste:
+    if type(agent) is Waste:
         portrayal["Shape"] = f"robots/resources/waste_{agent.colour}.png"
         # https://icons8.com/web-app/433/sheep
         portrayal["scale"] = 0.9
@@ -43,10 +38,42 @@ def wolf_sheep_portrayal(agent):
     return portrayal
 
 
-canvas_element = mesa.visualization.CanvasGrid(wolf_sheep_portrayal, 21, 5, 500, 125)
+def tile_portrayal(colour):
+    portrayal = {}
+    portrayal["Shape"] = f"robots/resources/tile_{colour}.png"
+    portrayal["scale"] = 0.9
+    portrayal["Layer"] = 0
+    portrayal["text_color"] = "Black"
+    return portrayal
+
+
+class ZoneCanvasGrid(mesa.visualization.CanvasGrid):
+    """
+    CanvasGrid that also draws the zone tiles from the model's zone raster,
+    since zones are no longer agents on the grid
+    """
+    def render(self, model):
+        grid_state = defaultdict(list)
+        for x in range(model.grid.width):
+            for y in range(model.grid.height):
+                portrayal = tile_portrayal(model.get_zone((x, y)))
+                portrayal["x"] = x
+                portrayal["y"] = y
+                grid_state[portrayal["Layer"]].append(portrayal)
+        for layer, portrayals in super().render(model).items():
+            grid_state[layer].extend(portrayals)
+        return grid_state
+
+
+canvas_element = ZoneCanvasGrid(wolf_sheep_portrayal, 21, 5, 500, 125)
 chart_element = mesa.visualization.ChartModule(
     [
-        {"Label": "Waste", "Color": "#AA0000"}
+        {"Label": "Waste", "Color": "#AA0000"},
+        {"Label": "Green waste", "Color": "#00AA00"},
+        {"Label": "Yellow waste", "Color": "#CCAA00"},
+        {"Label": "Red waste", "Color": "#FF4444"},
+        {"Label": "Carried waste", "Color": "#666666"},
+        {"Label": "Disposed waste", "Color": "#000000"},
     ]
 )
 
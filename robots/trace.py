@@ -0,0 +1,220 @@
+"""
+Structured event trace of a run
+
+EventTrace records the robots' actions and messages as fixed size records in a
+preallocated NumPy ring buffer, replacing the prints of the step loop.
+Events have a level, and the call sites check the level before building a
+record, so a disabled trace (level OFF, the default) costs one comparison.
+
+    OFF:   nothing is recorded
+    INFO:  pickups, transformations, drops and messages
+    DEBUG: INFO plus every move
+
+By default the ring keeps the last capacity events. With a path, a full ring is
+appended to that file instead, so the whole run is kept at a flat memory cost.
+
+Decode and filter a trace file after the run:
+    python -m robots.trace run.trace --kind pickup drop --agent 12 --from-step 100
+"""
+import argparse
+import csv
+import sys
+from enum import IntEnum
+
+import numpy as np
+
+from .zones import ZONE_COLOURS
+from robots.communication.message.MessagePerformative import MessagePerformative
+
+OFF = 0
+INFO = 1
+DEBUG = 2
+
+LEVELS = {'off': OFF, 'info': INFO, 'debug': DEBUG}
+
+MAGIC = b'RTRACE1\n'
+
+# One record per event
+# a, b: event arguments, see EventKind
+EVENT_DTYPE = np.dtype([
+    ('step', '<i4'),
+    ('kind', 'u1'),
+    ('agent', '<i4'),
+    ('x', '<i2'),
+    ('y', '<i2'),
+    ('a', '<i4'),
+    ('b', '<i4'),
+])
+
+
+class EventKind(IntEnum):
+    """
+        Kind of a trace event and the meaning of its a and b arguments
+    """
+    # a, b: previous x, y
+    MOVE = 1
+    # a: waste id, b: waste colour code
+    PICKUP = 2
+    # a: id of the waste consumed, b: new colour code of the remaining waste
+    TRANSFORM = 3
+    # a: waste id, b: waste colour code
+    DROP = 4
+    # a: performative value, b: receiver id, -1 for a topic
+    MESSAGE_SENT = 5
+    # a: performative value, b: sender id
+    MESSAGE_READ = 6
+
+    def __str__(self):
+        return self.name.lower()
+
+
+def colour_code(colour):
+    return ZONE_COLOURS.index(colour)
+
+
+class EventTrace():
+    """
+        Ring buffer of trace events, optionally spilled to a file
+    """
+    def __init__(self, level=OFF, capacity=65536, path=None):
+        self.level = level
+        self.capacity = capacity
+        self.path = path
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        # Number of events recorded since the start, the next one goes to head % capacity
+        self.head = 0
+        # Number of events already written to path
+        self.spilled = 0
+        if path is not None:
+            with open(path, 'wb') as output:
+                output.write(MAGIC)
+
+    def record(self, step, kind, agent, pos, a=0, b=0):
+        '''
+            Record one event, the caller checks the level first
+        '''
+        if self.path is not None and self.head - self.spilled == self.capacity:
+            self.flush()
+        self.events[self.head % self.capacity] = (step, kind, agent, pos[0], pos[1], a, b)
+        self.head += 1
+
+    def flush(self):
+        '''
+            Append the events not written yet to path
+        '''
+        if self.path is None or self.head == self.spilled:
+            return
+        with open(self.path, 'ab') as output:
+            self.ordered(self.spilled).tofile(output)
+        self.spilled = self.head
+
+    def resume(self):
+        '''
+            Cut path back to the events spilled so far, e.g. after restoring a snapshot,
+            the events written after it (by the original run) are dropped
+        '''
+        if self.path is None:
+            return
+        with open(self.path, 'r+b') as output:
+            output.truncate(len(MAGIC) + self.spilled * EVENT_DTYPE.itemsize)
+
+    def ordered(self, start=None):
+        '''
+            Return: the events in the ring from event number start (the oldest kept by default), oldest first
+        '''
+        oldest = max(0, self.head - self.capacity)
+        start = oldest if start is None else max(start, oldest)
+        first, last = start % self.capacity, self.head % self.capacity
+        if self.head - start == 0:
+            return self.events[:0]
+        if first < last:
+            return self.events[first:last]
+        return np.concatenate((self.events[first:], self.events[:last]))
+
+    def dump(self, path):
+        '''
+            Write the events in the ring to path, in the trace file format
+        '''
+        with open(path, 'wb') as output:
+            output.write(MAGIC)
+            self.ordered().tofile(output)
+
+
+def load_trace(path):
+    '''
+        Return: the events of a trace file as a read only structured array (memory map)
+    '''
+    with open(path, 'rb') as input_file:
+        if input_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+    return np.memmap(path, dtype=EVENT_DTYPE, mode='r', offset=len(MAGIC))
+
+
+def filter_events(events, kinds=None, agents=None, from_step=None, to_step=None):
+    '''
+        Return: the events matching every given criterion
+        kinds: EventKind values or names, agents: unique ids, steps are inclusive
+    '''
+    mask = np.ones(len(events), dtype=bool)
+    if kinds:
+        kinds = [EventKind[kind.upper()] if isinstance(kind, str) else kind for kind in kinds]
+        mask &= np.isin(events['kind'], kinds)
+    if agents:
+        mask &= np.isin(events['agent'], agents)
+    if from_step is not None:
+        mask &= events['step'] >= from_step
+    if to_step is not None:
+        mask &= events['step'] <= to_step
+    return events[mask]
+
+
+def describe(event):
+    '''
+        Return: (step, kind, agent, position, details) of an event, as text
+    '''
+    kind = EventKind(event['kind'])
+    a, b = int(event['a']), int(event['b'])
+    if kind == EventKind.MOVE:
+        details = f'from ({a}, {b})'
+    elif kind == EventKind.TRANSFORM:
+        details = f'consumed waste {a}, now {ZONE_COLOURS[b]}'
+    elif kind in (EventKind.PICKUP, EventKind.DROP):
+        details = f'waste {a} ({ZONE_COLOURS[b]})'
+    elif kind == EventKind.MESSAGE_SENT:
+        details = f'{MessagePerformative(a)} to {b if b >= 0 else "topic"}'
+    else:
+        details = f'{MessagePerformative(a)} from {b}'
+    return int(event['step']), str(kind), int(event['agent']), f"({event['x']}, {event['y']})", details
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Decode and filter a RadioactiveEnv trace file')
+    parser.add_argument('path')
+    parser.add_argument('--kind', nargs='+', choices=[str(kind) for kind in EventKind], default=None)
+    parser.add_argument('--agent', type=int, nargs='+', default=None)
+    parser.add_argument('--from-step', type=int, default=None)
+    parser.add_argument('--to-step', type=int, default=None)
+    parser.add_argument('--limit', type=int, default=None, help='print at most this many events')
+    parser.add_argument('--csv', action='store_true', help='write CSV instead of text')
+    parser.add_argument('--count', action='store_true', help='only print the number of events per kind')
+    args = parser.parse_args(argv)
+
+    events = filter_events(load_trace(args.path), args.kind, args.agent, args.from_step, args.to_step)
+    if args.count:
+        kinds, counts = np.unique(events['kind'], return_counts=True)
+        for kind, count in zip(kinds, counts):
+            print(f'{EventKind(kind)!s:<14}{count:>10}')
+        return
+    if args.limit is not None:
+        events = events[:args.limit]
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['step', 'kind', 'agent', 'position', 'details'])
+        writer.writerows(describe(event) for event in events)
+    else:
+        for event in events:
+            print('{:>8}  {:<14}{:>8}  {:<10}  {}'.format(*describe(event)))
+
+
+if __name__ == '__main__':
+    main()
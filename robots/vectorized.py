@@ -0,0 +1,427 @@
+"""
+Vectorized NumPy engine for the Radioactive Environment
+
+VectorizedRadioactiveEnv follows the rules of agents.deliberate (pick up,
+transform, move right, drop off, random walk) but keeps robot positions,
+inventories and waste occupancy in NumPy arrays. Every step, all robots sense,
+deliberate and act through batched array operations instead of one Robot.step
+call per agent, which is what makes fleets of 10k+ robots practical.
+
+Differences with the agent engine, which make it match statistically rather than
+step for step:
+    - robots all sense the state at the start of the step, then act together
+    - when several robots pick up on the same cell in the same step, a random one
+      collects the wastes
+    - robots draw from a NumPy generator rather than the Python random module
+
+Use conformance_report to compare both engines on the same parameters.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from .zones import ZONE_COLOURS
+
+GREEN, YELLOW, RED = range(len(ZONE_COLOURS))
+
+# Moore neighbourhood with centre, in the order used by WasteIndex.nearest to
+# break ties: distance first, then smallest cell
+OFFSETS = np.array([(0, 0)] + [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)])
+
+
+class VectorizedRadioactiveEnv():
+    """
+        Array based engine of the Radioactive Environment, see the module docstring
+    """
+    def __init__(
+        self,
+        width=21,
+        height=5,
+        initial_wastes_per_zone=6,
+        initial_robots_per_zone=1,
+        seed=None
+    ):
+        if width % 3 != 0:
+            raise ValueError("The grid width must be divisible by 3")
+        self.width = width
+        self.height = height
+        self.initial_wastes_per_zone = initial_wastes_per_zone
+        self.initial_robots_per_zone = initial_robots_per_zone
+        self.random = np.random.default_rng(seed)
+        self.steps = 0
+        self.steps_to_clear = None
+        self.messages_sent = 0
+
+        self.zone_locations = {'green':(0, width//3),
+            'yellow':(width//3, width*2//3),
+            'red':(width*2//3, width)}
+        self.disposal_x = width - 1
+
+        # Wastes lying on the grid, by colour code
+        self.waste = np.zeros((len(ZONE_COLOURS), width, height), dtype=np.int32)
+        robot_colours = []
+        robot_x = []
+        robot_y = []
+        for colour, (x_min, x_max) in self.zone_locations.items():
+            code = ZONE_COLOURS.index(colour)
+            x = self.random.integers(x_min, x_max, initial_wastes_per_zone)
+            y = self.random.integers(0, height, initial_wastes_per_zone)
+            np.add.at(self.waste[code], (x, y), 1)
+            robot_colours.append(np.full(initial_robots_per_zone, code))
+            robot_x.append(self.random.integers(x_min, x_max, initial_robots_per_zone))
+            robot_y.append(self.random.integers(0, height, initial_robots_per_zone))
+
+        # Robots
+        self.colour = np.concatenate(robot_colours)
+        self.x = np.concatenate(robot_x)
+        self.y = np.concatenate(robot_y)
+        # Robots may move in x < x_max, they drop off at x_max - 1
+        self.x_max = np.array([self.zone_locations[ZONE_COLOURS[code]][1] for code in self.colour], dtype=np.int64)
+        # Number of wastes carried, and whether the single carried waste has been transformed
+        self.held = np.zeros(len(self.colour), dtype=np.int64)
+        self.transformed = np.zeros(len(self.colour), dtype=bool)
+
+        # Waste locations awarded to the yellow and red robots (waste_beliefs of the KnowledgeBase)
+        self.announcements = {
+            code: _Announcements(np.flatnonzero(self.colour == code), len(self.colour), width, height)
+            for code in (YELLOW, RED)
+        }
+        # Contract net, as RadioactiveEnv.handle_messages. A message is acted upon two steps
+        # after it is sent: it is dispatched at the start of the next step and read in do()
+        # at the end of it. Calls for proposals are awarded two steps after the drop off, on
+        # the bids made from the state of the step in between, and the award reaches the
+        # winner two steps later. Both are keyed by the step they happen at.
+        self._calls = defaultdict(list)
+        self._awards = defaultdict(list)
+
+    def step(self):
+        '''
+            Sense, deliberate and act for every robot at once
+        '''
+        for code, x, y in self._calls.pop(self.steps, ()):
+            self._award(code, x, y)
+        for code, x, y, winner in self._awards.pop(self.steps, ()):
+            self.announcements[code].append(x, y, winner)
+
+        if self.steps > 0:
+            # The first step of a Robot is an observation only
+            self._act()
+        self.steps += 1
+
+    def _act(self):
+        x, y, colour, x_max, held = self.x, self.y, self.colour, self.x_max, self.held
+        at_edge = x == x_max - 1
+        waste_here = self.waste[colour, x, y] > 0
+        red = colour == RED
+        # As agents.update, the robots evict the awarded location of their cell if they find no waste there
+        for code, announcements in self.announcements.items():
+            robots = np.flatnonzero((colour == code) & ~waste_here)
+            announcements.evict(robots, x[robots], y[robots])
+
+        # ===== Deliberate, as agents.deliberate =====
+        carrying_out = np.where(red, held == 1, (held == 1) & self.transformed)
+        move_right = carrying_out & ~at_edge
+        drop = carrying_out & at_edge
+        pick_up = ~carrying_out & waste_here & np.where(red, ~at_edge, True)
+        transform = ~red & (held == 2) & ~pick_up
+        look = ~carrying_out & ~pick_up
+
+        # ===== Act =====
+        new_x = x.copy()
+        new_y = y.copy()
+        new_x[move_right] += 1
+        looking = np.flatnonzero(look)
+        if len(looking) > 0:
+            new_x[looking], new_y[looking] = self._look_for_waste(looking)
+
+        self.held[transform] = 1
+        self.transformed[transform] = True
+        self._drop(np.flatnonzero(drop))
+        self._pick_up(np.flatnonzero(pick_up))
+        self.x, self.y = new_x, new_y
+
+    def _look_for_waste(self, robots):
+        '''
+            Next cell of the looking robots: nearest waste in sight, else the nearest
+            location awarded to the robot, else a random cell of the restricted neighbourhood
+        '''
+        x = self.x[robots]
+        y = self.y[robots]
+        colour = self.colour[robots]
+        x_max = self.x_max[robots]
+        cells_x = x[:, None] + OFFSETS[:, 0]
+        cells_y = y[:, None] + OFFSETS[:, 1]
+        valid = (cells_x >= 0) & (cells_x < x_max[:, None]) & (cells_y >= 0) & (cells_y < self.height)
+        clipped_x = np.clip(cells_x, 0, self.width - 1)
+        clipped_y = np.clip(cells_y, 0, self.height - 1)
+        has_waste = valid & (cells_x != x_max[:, None] - 1) & (self.waste[colour[:, None], clipped_x, clipped_y] > 0)
+
+        # Random cell of the restricted neighbourhood
+        counts = valid.sum(axis=1)
+        pick = (self.random.random(len(robots)) * counts).astype(np.int64)
+        choice = np.argmax(np.cumsum(valid, axis=1) > pick[:, None], axis=1)
+        next_x = cells_x[np.arange(len(robots)), choice]
+        next_y = cells_y[np.arange(len(robots)), choice]
+
+        # Robots knowing announced locations take one greedy step towards their own nearest one
+        for code, announcements in self.announcements.items():
+            members = np.flatnonzero(colour == code)
+            if len(members) == 0:
+                continue
+            target_x, target_y, has_target = announcements.nearest(robots[members], x[members], y[members])
+            targeted = members[has_target]
+            target_x = target_x[has_target]
+            target_y = target_y[has_target]
+            next_x[targeted] = x[targeted] + np.sign(target_x - x[targeted])
+            next_y[targeted] = y[targeted] + np.sign(target_y - y[targeted])
+
+        # Waste in sight
+        seen = has_waste.any(axis=1)
+        nearest = np.argmax(has_waste, axis=1)
+        next_x[seen] = cells_x[seen, nearest[seen]]
+        next_y[seen] = cells_y[seen, nearest[seen]]
+        return next_x, next_y
+
+    def _pick_up(self, robots):
+        '''
+            Collect all the wastes of the robot's colour on its cell
+            When several robots pick up on the same cell, a random one gets the wastes
+        '''
+        if len(robots) == 0:
+            return
+        robots = self.random.permutation(robots)
+        colour, x, y = self.colour[robots], self.x[robots], self.y[robots]
+        keys = (colour * self.width + x) * self.height + y
+        _, first = np.unique(keys, return_index=True)
+        winners = robots[first]
+        self.held[winners] += self.waste[colour[first], x[first], y[first]]
+        self.waste[colour[first], x[first], y[first]] = 0
+
+    def _drop(self, robots):
+        '''
+            Drop the carried waste on the robot's cell
+            Green and yellow robots drop a transformed waste and announce its location
+        '''
+        if len(robots) == 0:
+            return
+        colour = self.colour[robots]
+        dropped = np.where(colour == RED, RED, colour + 1)
+        np.add.at(self.waste, (dropped, self.x[robots], self.y[robots]), 1)
+        self.held[robots] = 0
+        self.transformed[robots] = False
+        for code, x, y in zip(dropped[colour != RED], self.x[robots][colour != RED], self.y[robots][colour != RED]):
+            # Call for proposals published to the robots of the next colour
+            self._calls[self.steps + 2].append((int(code), int(x), int(y)))
+            self.messages_sent += 1
+
+    def _award(self, code, x, y):
+        '''
+            Award an announced waste to the best bid, as agents.bid:
+            fewest known locations first, then the closest robot, then the lowest index
+        '''
+        announcements = self.announcements[code]
+        candidates = announcements.robots
+        if len(candidates) == 0:
+            return
+        distance = np.maximum(np.abs(self.x[candidates] - x), np.abs(self.y[candidates] - y))
+        # One key ordering the bids, a single pass instead of a sort (candidates are in increasing order)
+        key = (announcements.pending * max(self.width, self.height) + distance) * len(candidates)
+        key += np.arange(len(candidates))
+        winner = candidates[np.argmin(key)]
+        # One ACCEPT per bidder and the COMMIT to the winner
+        self.messages_sent += len(candidates) + 1
+        self._awards[self.steps + 2].append((code, x, y, winner))
+
+    def reset_randomizer(self, seed=None):
+        '''
+            Restart the random number generator from seed, as mesa.Model does
+        '''
+        self.random = np.random.default_rng(seed)
+
+    def is_cleared(self):
+        '''
+            Same definition as RadioactiveEnv.is_cleared
+        '''
+        on_grid = self.waste.sum() - self.waste[RED, self.disposal_x, :].sum()
+        in_transit = ((self.colour == RED) & (self.held > 0)) | self.transformed | (self.held > 1)
+        return on_grid == 0 and not in_transit.any()
+
+    def _stranded(self):
+        '''
+            Return: the stranded wastes by colour code once the grid is cleared, see model.stranded_wastes
+        '''
+        stranded = np.zeros(len(ZONE_COLOURS), dtype=np.int64)
+        if self.is_cleared():
+            np.add.at(stranded, self.colour, self.held)
+        return stranded
+
+    def get_metrics(self):
+        '''
+            Same metrics as RadioactiveEnv.get_metrics
+        '''
+        remaining = self.waste.sum(axis=(1, 2))
+        disposed = int(self.waste[RED, self.disposal_x, :].sum())
+        remaining[RED] -= disposed
+        carried = np.where(self.transformed, self.colour + 1, self.colour)
+        np.add.at(remaining, carried, self.held)
+        stranded = self._stranded()
+        remaining -= stranded
+        return {
+            'steps': self.steps,
+            'steps_to_clear': self.steps_to_clear,
+            'waste_remaining': {colour: int(remaining[code]) for code, colour in enumerate(ZONE_COLOURS)},
+            'waste_stranded': {colour: int(stranded[code]) for code, colour in enumerate(ZONE_COLOURS)},
+            'waste_disposed': disposed,
+            'messages_sent': self.messages_sent,
+        }
+
+    def run_model(self, step_count=200):
+        '''
+            Same as RadioactiveEnv.run_model
+        '''
+        for _ in range(step_count):
+            if self.is_cleared():
+                break
+            self.step()
+        if self.steps_to_clear is None and self.is_cleared():
+            self.steps_to_clear = self.steps
+        return self.get_metrics()
+
+
+class _Announcements():
+    """
+        Waste locations awarded to the robots of one colour (the WasteBeliefs of the agent robots)
+
+        The per robot sets are stored sparsely, as one (robot row, x, y) entry per location a
+        robot knows, so the cost of a query follows the number of awarded locations instead of
+        robots x locations. As with WasteBeliefs, a robot knows a location once however many
+        times it is awarded, heads for the nearest one (ties broken on the location) and evicts
+        the one of its cell when it finds no waste of its colour there.
+    """
+    def __init__(self, robots, robot_count, width, height):
+        self.robots = robots
+        self.width = width
+        self.height = height
+        # Row of each robot of the engine among robots, -1 for robots of other colours
+        self.row = np.full(robot_count, -1, dtype=np.int64)
+        self.row[robots] = np.arange(len(robots))
+        # Entries, the first count are in use
+        self.owner = np.zeros(16, dtype=np.int64)
+        self.x = np.zeros(16, dtype=np.int64)
+        self.y = np.zeros(16, dtype=np.int64)
+        self.count = 0
+        # Number of locations known by each robot
+        self.pending = np.zeros(len(robots), dtype=np.int64)
+
+    def append(self, x, y, robot):
+        '''
+            Add a location known by one robot
+        '''
+        row = self.row[robot]
+        count = self.count
+        if ((self.owner[:count] == row) & (self.x[:count] == x) & (self.y[:count] == y)).any():
+            return
+        if count == len(self.owner):
+            self.owner = np.concatenate([self.owner, np.zeros_like(self.owner)])
+            self.x = np.concatenate([self.x, np.zeros_like(self.x)])
+            self.y = np.concatenate([self.y, np.zeros_like(self.y)])
+        self.owner[count] = row
+        self.x[count] = x
+        self.y[count] = y
+        self.pending[row] += 1
+        self.count += 1
+
+    def _slots(self, robots):
+        '''
+            Return: the index of each entry's robot in robots, -1 for the robots not in it
+        '''
+        slot = np.full(len(self.robots), -1, dtype=np.int64)
+        slot[self.row[robots]] = np.arange(len(robots))
+        return slot[self.owner[:self.count]]
+
+    def nearest(self, robots, x, y):
+        '''
+            Nearest known location of each robot from (x, y), and a mask of the robots knowing one
+        '''
+        if self.count == 0:
+            return x, y, np.zeros(len(robots), dtype=bool)
+        slots = self._slots(robots)
+        queried = slots >= 0
+        slots = slots[queried]
+        entry_x = self.x[:self.count][queried]
+        entry_y = self.y[:self.count][queried]
+        distance = np.maximum(np.abs(entry_x - x[slots]), np.abs(entry_y - y[slots]))
+        # Distance first, then the location, as WasteBeliefs.nearest, the location is decoded from the key
+        key = (distance * self.width + entry_x) * self.height + entry_y
+        none = np.iinfo(np.int64).max
+        best = np.full(len(robots), none, dtype=np.int64)
+        np.minimum.at(best, slots, key)
+        has_target = best != none
+        target_x = np.where(has_target, best // self.height % self.width, x)
+        target_y = np.where(has_target, best % self.height, y)
+        return target_x, target_y, has_target
+
+    def evict(self, robots, x, y):
+        '''
+            Forget the location (x, y) of each robot, found without waste of its colour
+        '''
+        if self.count == 0 or len(robots) == 0:
+            return
+        slots = self._slots(robots)
+        queried = slots >= 0
+        evicted = np.zeros(self.count, dtype=bool)
+        evicted[queried] = ((self.x[:self.count][queried] == x[slots[queried]])
+                            & (self.y[:self.count][queried] == y[slots[queried]]))
+        if not evicted.any():
+            return
+        np.subtract.at(self.pending, self.owner[:self.count][evicted], 1)
+        kept = np.flatnonzero(~evicted)
+        self.owner[:len(kept)] = self.owner[kept]
+        self.x[:len(kept)] = self.x[kept]
+        self.y[:len(kept)] = self.y[kept]
+        self.count = len(kept)
+
+
+def ks_statistic(a, b):
+    '''
+        Two sample Kolmogorov-Smirnov statistic: largest gap between the empirical
+        distribution functions of a and b, 0 for identical samples, 1 for disjoint ones
+    '''
+    a = np.sort(a)
+    b = np.sort(b)
+    values = np.concatenate([a, b])
+    gaps = np.searchsorted(a, values, side='right') / len(a) - np.searchsorted(b, values, side='right') / len(b)
+    return float(np.max(np.abs(gaps)))
+
+
+def conformance_report(params=None, seeds=range(50), step_count=2000):
+    '''
+        Run the agent engine and the vectorized engine on the same parameters and seeds
+        Return: per engine, the mean of the summary metrics, the share of cleared runs and
+            the median steps to clear, and under 'steps_to_clear_ks' the ks_statistic of the
+            steps to clear of both engines (None unless both cleared runs)
+    '''
+    from .batch import run_single
+
+    params = params or {}
+    report = {}
+    steps_to_clear = {}
+    for engine in ('agents', 'vectorized'):
+        results = [run_single({**params, 'seed': seed}, step_count, engine=engine) for seed in seeds]
+        cleared = [result['steps_to_clear'] for result in results if result['steps_to_clear'] is not None]
+        steps_to_clear[engine] = cleared
+        report[engine] = {
+            'cleared_share': len(cleared) / len(results),
+            'mean_steps_to_clear': float(np.mean(cleared)) if cleared else None,
+            'median_steps_to_clear': float(np.median(cleared)) if cleared else None,
+            'mean_waste_disposed': float(np.mean([result['waste_disposed'] for result in results])),
+            'mean_messages_sent': float(np.mean([result['messages_sent'] for result in results])),
+            'mean_waste_remaining': {
+                colour: float(np.mean([result['waste_remaining'][colour] for result in results]))
+                for colour in ZONE_COLOURS
+            },
+        }
+    report['steps_to_clear_ks'] = None
+    if steps_to_clear['agents'] and steps_to_clear['vectorized']:
+        report['steps_to_clear_ks'] = ks_statistic(steps_to_clear['agents'], steps_to_clear['vectorized'])
+    return report
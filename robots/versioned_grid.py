@@ -0,0 +1,82 @@
+"""
+MultiGrid with a version stamp per cell
+
+Every placement, removal or move of an agent increments the version of the grid
+and stamps the cells with it, so comparing the stamp of a cell with the one seen last
+time tells whether it changed without looking at its contents. The incremental
+percepts of RadioactiveEnv use it to send robots only the cells that changed
+since their last observation.
+
+Wastes the grid doesn't hold (e.g. the copies of the wastes of a neighbouring
+strip in distributed mode) mark their cells with touch().
+"""
+import mesa
+
+# Returned when no cell changed, so an idle robot doesn't allocate a list
+NO_CHANGES = ()
+
+
+class VersionedMultiGrid(mesa.space.MultiGrid):
+    """
+        MultiGrid stamping each cell with the grid version of its last change
+        Cells never changed have version 0 and are empty
+    """
+    def __init__(self, width, height, torus):
+        super().__init__(width, height, torus)
+        self.version = 0
+        self.versions = [[0] * height for _ in range(width)]
+
+    def touch(self, pos):
+        '''
+            Mark a cell as changed, the grid does it on every placement, removal and move
+        '''
+        self.version += 1
+        self.versions[pos[0]][pos[1]] = self.version
+
+    def place_agent(self, agent, pos):
+        super().place_agent(agent, pos)
+        self.touch(pos)
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        super().remove_agent(agent)
+        self.touch(pos)
+
+    def move_agent(self, agent, pos):
+        '''
+            Move through remove_agent and place_agent, so both cells are stamped
+            Some mesa 2 releases move with the private _remove_agent and _place_agent instead
+        '''
+        pos = self.torus_adj(pos)
+        self.remove_agent(agent)
+        self.place_agent(agent, pos)
+
+    def cell_version(self, pos):
+        return self.versions[pos[0]][pos[1]]
+
+    def changed_cells(self, cells, seen):
+        '''
+            Cells whose version differs from the one in seen, cells absent from seen are always changed
+            seen is updated, and only keeps the given cells, so it stays the size of a neighbourhood
+            Return: list of the changed cells, NO_CHANGES if none
+        '''
+        versions = self.versions
+        changed = None
+        for cell in cells:
+            version = versions[cell[0]][cell[1]]
+            if seen.get(cell, -1) != version:
+                seen[cell] = version
+                if changed is None:
+                    changed = []
+                changed.append(cell)
+        if len(seen) > len(cells):
+            forget_cells(seen, cells)
+        return NO_CHANGES if changed is None else changed
+
+
+def forget_cells(cells_map, cells):
+    '''
+        Remove from cells_map the keys that are not in cells
+    '''
+    for cell in [cell for cell in cells_map if cell not in cells]:
+        del cells_map[cell]
@@ -0,0 +1,86 @@
+class WasteIndex():
+    """
+    Per colour index of the wastes lying on the grid, keyed by position
+
+    Kept up to date by the model whenever a waste is placed on or removed from
+    the grid, so robots can ask about wastes of their colour without scanning
+    cell contents.
+    """
+    def __init__(self):
+        # colour -> {pos: [waste, ...]}
+        self.by_colour = {}
+
+    def add(self, waste, pos):
+        '''
+            Record a waste lying at pos
+        '''
+        self.by_colour.setdefault(waste.colour, {}).setdefault(pos, []).append(waste)
+
+    def remove(self, waste, pos):
+        '''
+            Forget a waste that has left pos
+        '''
+        cells = self.by_colour[waste.colour]
+        wastes = cells[pos]
+        wastes.remove(waste)
+        if len(wastes) == 0:
+            del cells[pos]
+
+    def wastes_at(self, pos, colour):
+        '''
+            Return the wastes of a colour lying at pos (do not modify the result)
+        '''
+        return self.by_colour.get(colour, {}).get(pos, ())
+
+    def has_waste(self, pos, colour):
+        return pos in self.by_colour.get(colour, ())
+
+    def count(self, colour):
+        '''
+            Number of wastes of a colour on the grid
+        '''
+        return sum(len(wastes) for wastes in self.by_colour.get(colour, {}).values())
+
+    def positions(self, colour):
+        '''
+            Positions holding at least one waste of a colour
+        '''
+        return self.by_colour.get(colour, {}).keys()
+
+    def nearest(self, pos, colour, radius, x_limit=None, exclude_x=None):
+        '''
+            Nearest position (Chebyshev distance, as for a Moore neighbourhood) within radius
+            of pos that holds a waste of the colour
+            x_limit: only consider cells with x < x_limit
+            exclude_x: ignore the cells of that column
+            Ties are broken on the smallest position
+            Return: (x,y) or None
+        '''
+        cells = self.by_colour.get(colour)
+        if not cells:
+            return None
+        x, y = pos
+        best = None
+        best_distance = None
+        if len(cells) < (2*radius + 1)**2:
+            # Fewer wastes than cells in the search square, check each of them
+            candidates = cells
+        else:
+            candidates = [
+                (x + dx, y + dy)
+                for dx in range(-radius, radius + 1)
+                for dy in range(-radius, radius + 1)
+                if (x + dx, y + dy) in cells
+            ]
+        for cell in candidates:
+            if x_limit is not None and cell[0] >= x_limit:
+                continue
+            if exclude_x is not None and cell[0] == exclude_x:
+                continue
+            distance = max(abs(cell[0] - x), abs(cell[1] - y))
+            if distance > radius:
+                continue
+            if best is None or (distance, cell) < (best_distance, best):
+                best = cell
+                best_distance = distance
+        return best
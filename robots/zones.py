@@ -0,0 +1,28 @@
+import numpy as np
+
+# Zone colours, in west to east order. The raster stores the index in this tuple.
+ZONE_COLOURS = ('green', 'yellow', 'red')
+
+
+class ZoneRaster():
+    """
+    Compact per-cell storage of the zone colour
+
+    One byte per cell instead of one tile agent per cell.
+    """
+    def __init__(self, width, height, zone_locations):
+        self.width = width
+        self.height = height
+        self.codes = np.zeros((width, height), dtype=np.uint8)
+        for colour, (x_min, x_max) in zone_locations.items():
+            self.codes[x_min:x_max, :] = ZONE_COLOURS.index(colour)
+
+    def get_zone(self, pos):
+        '''
+            Return the colour of the zone containing pos
+        '''
+        x, y = pos
+        return ZONE_COLOURS[self.codes[x, y]]
+
+    def __getitem__(self, pos):
+        return self.get_zone(pos)
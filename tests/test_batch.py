@@ -0,0 +1,20 @@
+import csv
+
+from robots.batch import main
+
+
+def test_sweep_writes_one_row_per_run(tmp_path):
+    output = tmp_path / 'sweep.csv'
+    main(['--seeds', '2', '--robots', '1', '2', '--steps', '50', '--processes', '1', '--output', str(output)])
+    with open(output, newline='') as results:
+        rows = list(csv.DictReader(results))
+    assert len(rows) == 4
+    assert {row['initial_robots_per_zone'] for row in rows} == {'1', '2'}
+    assert 'waste_remaining_green' in rows[0]
+
+
+def test_empty_sweep_writes_nothing(tmp_path, capsys):
+    output = tmp_path / 'sweep.csv'
+    main(['--seeds', '0', '--output', str(output)])
+    assert not output.exists()
+    assert 'No runs' in capsys.readouterr().out
@@ -0,0 +1,35 @@
+import pytest
+
+from robots import batch
+from robots.batch import flatten, sweep
+from robots.cache import ResultCache
+
+RUNS = [dict(seed=seed, initial_robots_per_zone=2) for seed in range(3)]
+
+
+def test_hit_returns_the_same_rows(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+    results = sweep(RUNS, step_count=100, processes=1, cache=cache)
+
+    def run_single(*args, **kwargs):
+        raise AssertionError("cached run simulated again")
+    monkeypatch.setattr(batch, 'run_single', run_single)
+    cached = sweep(RUNS, step_count=100, processes=1, cache=cache)
+    assert [flatten(result) for result in cached] == [flatten(result) for result in results]
+
+
+def test_code_or_parameter_change_misses(tmp_path):
+    cache = ResultCache(str(tmp_path), version='a')
+    result, = sweep(RUNS[:1], step_count=100, processes=1, cache=cache)
+    assert cache.get(RUNS[0], 100, 'agents') == result
+    assert ResultCache(str(tmp_path), version='b').get(RUNS[0], 100, 'agents') is None
+    assert cache.get(dict(RUNS[0], initial_robots_per_zone=3), 100, 'agents') is None
+    assert cache.get(RUNS[0], 200, 'agents') is None
+    assert cache.get(RUNS[0], 100, 'vectorized') is None
+
+
+def test_runs_without_seed_are_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put({'seed': None}, 100, 'agents', {'steps': 100})
+    assert cache.get({'seed': None}, 100, 'agents') is None
+    assert list(tmp_path.iterdir()) == []
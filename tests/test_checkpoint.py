@@ -0,0 +1,81 @@
+import sys
+
+import numpy as np
+import pytest
+
+from robots.checkpoint import fork, restore, snapshot
+from robots.metrics_stream import read_metrics
+from robots.model import RadioactiveEnv
+
+
+@pytest.mark.parametrize('format', ['binary', 'csv'])
+def test_resume_interrupted_stream(tmp_path, format):
+    path = str(tmp_path / 'run')
+    reference_path = str(tmp_path / 'reference')
+    reference = RadioactiveEnv(seed=3, metrics_path=reference_path, metrics_format=format, metrics_chunk_size=16)
+    for _ in range(60):
+        reference.step()
+    reference.close()
+
+    model = RadioactiveEnv(seed=3, metrics_path=path, metrics_format=format, metrics_chunk_size=16)
+    for _ in range(30):
+        model.step()
+    data = snapshot(model)
+    # The original keeps writing after the snapshot, then the process is interrupted
+    for _ in range(20):
+        model.step()
+    model.metrics_stream.flush()
+
+    resumed = restore(data)
+    for _ in range(30):
+        resumed.step()
+    resumed.close()
+
+    for table in ('model', 'agent'):
+        expected = read_metrics(reference_path, table)
+        metrics = read_metrics(path, table)
+        assert metrics.keys() == expected.keys()
+        for column in expected:
+            np.testing.assert_array_equal(metrics[column], expected[column])
+
+
+def test_fork_continues_like_the_original():
+    model = RadioactiveEnv(seed=1)
+    for _ in range(80):
+        model.step()
+    copy, = fork(model, 1)
+    for _ in range(80):
+        copy.step()
+        model.step()
+    assert copy.get_metrics() == model.get_metrics()
+
+
+def test_snapshot_many_robots():
+    # The robots see each other in their percepts, the snapshot must not follow them
+    # from one percept to the next
+    model = RadioactiveEnv(width=60, height=60, initial_wastes_per_zone=50, initial_robots_per_zone=600, seed=2)
+    for _ in range(2):
+        model.step()
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(300)
+    try:
+        data = snapshot(model)
+    finally:
+        sys.setrecursionlimit(limit)
+    copy = restore(data)
+    for _ in range(5):
+        copy.step()
+        model.step()
+    assert copy.get_metrics() == model.get_metrics()
+
+
+def test_forks_with_seeds_are_distinct_and_reproducible():
+    model = RadioactiveEnv(seed=5, initial_robots_per_zone=2)
+    for _ in range(20):
+        model.step()
+    data = snapshot(model)
+    runs = []
+    for _ in range(2):
+        runs.append([forked.run_model(150) for forked in fork(data, 3, seeds=[10, 11, 12])])
+    assert runs[0] == runs[1]
+    assert runs[0][0] != runs[0][1] != runs[0][2] != runs[0][0]
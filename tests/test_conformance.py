@@ -0,0 +1,14 @@
+from robots.vectorized import conformance_report
+
+
+def test_vectorized_engine_matches_the_agent_engine():
+    # Both engines on the default grid, enough seeds for about 50 cleared runs each
+    report = conformance_report(seeds=range(300), step_count=300)
+    agents = report['agents']
+    vectorized = report['vectorized']
+    assert abs(agents['cleared_share'] - vectorized['cleared_share']) <= 0.05
+    assert abs(agents['median_steps_to_clear'] - vectorized['median_steps_to_clear']) <= 0.1 * agents['median_steps_to_clear']
+    assert report['steps_to_clear_ks'] <= 0.2
+    assert abs(agents['mean_messages_sent'] - vectorized['mean_messages_sent']) <= 0.1 * agents['mean_messages_sent']
+    for colour, remaining in agents['mean_waste_remaining'].items():
+        assert abs(remaining - vectorized['mean_waste_remaining'][colour]) <= 0.5
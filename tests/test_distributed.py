@@ -0,0 +1,13 @@
+from robots.distributed import DistributedRadioactiveEnv
+
+
+def test_transports_give_the_same_run():
+    params = dict(width=30, height=10, initial_wastes_per_zone=12, initial_robots_per_zone=3, seed=4)
+    results = []
+    for transport in ('pipe', 'socket'):
+        with DistributedRadioactiveEnv(transport=transport, **params) as model:
+            results.append(model.run_model(150))
+    assert results[0] == results[1]
+    # The wastes are handed over between the zones, through the contract net messages
+    assert results[0]['messages_sent'] > 0
+    assert results[0]['waste_disposed'] > 0
@@ -0,0 +1,46 @@
+from robots.agents import Robot, Waste
+from robots.communication.mailbox.Mailbox import Mailbox
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+from robots.model import RadioactiveEnv
+
+
+class Clock():
+    def __init__(self):
+        self.step = 0
+
+    def __call__(self):
+        return self.step
+
+
+def test_read_messages_age_from_their_arrival():
+    clock = Clock()
+    mailbox = Mailbox(max_age=5, clock=clock)
+    mailbox.receive_messages(Message(1, 2, MessagePerformative.INFORM_REF, 'old'))
+    clock.step = 4
+    mailbox.receive_messages(Message(3, 2, MessagePerformative.INFORM_REF, 'new'))
+    clock.step = 6
+    assert [message.get_content() for message in mailbox.get_new_messages()] == ['old', 'new']
+    assert mailbox.get_statistics()['age_at_read'] == {6: 1, 2: 1}
+    # Received at step 0, older than max_age at step 6 even though it was just read
+    assert [message.get_content() for message in mailbox.get_messages()] == ['new']
+    assert mailbox.get_messages_from_exp(1) == []
+    clock.step = 10
+    assert mailbox.get_messages() == []
+
+
+def test_mailbox_is_built_on_the_first_message():
+    model = RadioactiveEnv(seed=0, mailbox_max_messages=1)
+    waste = next(iter(model.schedule.get_agents_of_type(Waste)))
+    robot = next(iter(model.schedule.get_agents_of_type(Robot)))
+    assert waste._CommunicatingAgent__mailbox is None
+    assert waste.get_new_messages() == []
+    assert waste.get_messages() == []
+    assert waste.get_mailbox_statistics()['received'] == 0
+    robot.receive_message(Message(1, robot.unique_id, MessagePerformative.INFORM_REF, 'first'))
+    robot.receive_message(Message(1, robot.unique_id, MessagePerformative.INFORM_REF, 'second'))
+    assert robot.get_unread_count() == 2
+    assert model.message_service.get_unread_count() == 2
+    # The mailbox follows the retention policy of the model
+    assert [message.get_content() for message in robot.get_messages()] == ['second']
+    assert model.message_service.get_unread_count() == 0
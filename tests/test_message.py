@@ -0,0 +1,25 @@
+import copy
+import pickle
+
+import pytest
+
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+
+
+def test_message_is_immutable():
+    message = Message(1, 'robots:red', MessagePerformative.PROPOSE, (3, 4))
+    with pytest.raises(AttributeError):
+        message._Message__content = (0, 0)
+    with pytest.raises(AttributeError):
+        message.content = (0, 0)
+    with pytest.raises(AttributeError):
+        del message._Message__to_agent
+    assert message.get_content() == (3, 4)
+
+
+def test_message_copies_keep_their_fields():
+    message = Message(1, 2, MessagePerformative.ACCEPT, ((3, 4), (0, 1)))
+    for duplicate in (pickle.loads(pickle.dumps(message)), copy.copy(message), copy.deepcopy(message)):
+        assert (duplicate.get_exp(), duplicate.get_dest(), duplicate.get_performative(), duplicate.get_content()) \
+            == (1, 2, MessagePerformative.ACCEPT, ((3, 4), (0, 1)))
@@ -0,0 +1,79 @@
+import mesa
+
+from robots.communication.agent.CommunicatingAgent import CommunicatingAgent
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+from robots.communication.message.MessageService import MessageService
+from robots.scheduler import RandomActivationByTypeFiltered
+
+
+def service_with_agents(*names):
+    model = mesa.Model()
+    model.schedule = schedule = RandomActivationByTypeFiltered(model)
+    service = MessageService(schedule)
+    agents = [CommunicatingAgent(unique_id, model, name, message_service=service)
+              for unique_id, name in enumerate(names, 1)]
+    return schedule, service, agents
+
+
+def test_index_follows_the_schedule():
+    schedule, service, (first, second, third) = service_with_agents('green', 'green', 'red')
+    assert service.find_agent_from_id(1) is None
+    for agent in (first, second, third):
+        schedule.add(agent)
+    assert service.find_agent_from_id(2) is second
+    assert set(service.find_agents_from_name('green')) == {first, second}
+    assert service.find_agent_from_name('red') is third
+
+    schedule.remove(first)
+    assert service.find_agent_from_id(1) is None
+    assert service.find_agents_from_name('green') == [second]
+    schedule.remove(third)
+    assert service.find_agent_from_name('red') is None
+    assert service.find_agents_from_name('red') == []
+
+
+def test_agents_scheduled_before_the_service_are_indexed():
+    model = mesa.Model()
+    model.message_service = None
+    model.schedule = schedule = RandomActivationByTypeFiltered(model)
+    agent = CommunicatingAgent(1, model, 'green')
+    schedule.add(agent)
+    service = MessageService(schedule)
+    assert service.find_agent_from_id(1) is agent
+    assert service.find_agent_from_name('green') is agent
+
+
+def test_messages_are_delivered_by_id_then_name():
+    schedule, service, (first, second) = service_with_agents('green', 'red')
+    schedule.add(first)
+    schedule.add(second)
+    first.send_message(Message(1, 2, MessagePerformative.INFORM_REF, 'by id'))
+    first.send_message(Message(1, 'red', MessagePerformative.INFORM_REF, 'by name'))
+    assert [message.get_content() for message in second.get_new_messages()] == ['by id', 'by name']
+    assert service.get_delivered_count() == 2
+
+
+def test_topic_messages_reach_every_subscriber():
+    schedule, service, (sender, first, second) = service_with_agents('green', 'yellow', 'yellow')
+    for agent in (sender, first, second):
+        schedule.add(agent)
+    service.add_topic('robots:yellow')
+    sender.send_message(Message(1, 'robots:yellow', MessagePerformative.PROPOSE, (3, 4)))
+    assert service.get_dropped_count() == 1
+
+    service.subscribe('robots:yellow', first)
+    service.subscribe('robots:yellow', second)
+    message = Message(1, 'robots:yellow', MessagePerformative.PROPOSE, (5, 6))
+    sender.send_message(message)
+    assert first.get_new_messages() == [message]
+    # The same message object is shared by the subscribers
+    assert second.get_new_messages()[0] is message
+    assert service.get_delivered_count() == 2
+
+    service.unsubscribe('robots:yellow', first)
+    schedule.remove(second)
+    assert service.get_subscribers('robots:yellow') == []
+    sender.send_message(Message(1, 'robots:yellow', MessagePerformative.PROPOSE, (7, 8)))
+    assert first.get_new_messages() == []
+    assert service.get_dropped_count() == 2
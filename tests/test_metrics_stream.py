@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pytest
+
+from robots.agents import Robot
+from robots.metrics_stream import StreamingCollector, read_metrics
+from robots.model import RadioactiveEnv
+
+
+@pytest.mark.parametrize('format', ['binary', 'csv'])
+def test_rerun_into_same_directory_replaces_tables(tmp_path, format):
+    path = str(tmp_path / 'run')
+    first = RadioactiveEnv(seed=0, metrics_path=path, metrics_format=format)
+    for _ in range(50):
+        first.step()
+    first.close()
+
+    second = RadioactiveEnv(seed=1, metrics_path=path, metrics_format=format)
+    for _ in range(10):
+        second.step()
+    second.close()
+
+    model = read_metrics(path)
+    assert len(model['step']) == 10
+    np.testing.assert_array_equal(model['step'], np.arange(1, 11))
+    robots = read_metrics(path, 'agent')
+    assert len(robots['step']) == 10 * second.schedule.get_type_count(Robot)
+    if format == 'binary':
+        # The first run's rows must not be left behind the schema's row count
+        assert os.path.getsize(os.path.join(path, 'model', 'step.bin')) == 10 * 8
+
+
+def test_collector_round_trip(tmp_path):
+    path = str(tmp_path / 'run')
+    model = RadioactiveEnv(seed=0)
+    collector = StreamingCollector(path, {'disposed': lambda model: model.waste_disposed}, chunk_size=7)
+    for _ in range(20):
+        model.step()
+        collector.collect(model)
+    collector.close()
+    table = read_metrics(path)
+    np.testing.assert_array_equal(table['step'], np.arange(1, 21))
+    assert table['disposed'][-1] == model.waste_disposed
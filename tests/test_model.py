@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+
+from robots.agents import Robot
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+from robots.model import RadioactiveEnv, stranded_wastes
+
+
+def test_stranded_wastes():
+    assert stranded_wastes([]) == {}
+    assert stranded_wastes([('green', ['green']), ('yellow', ['yellow'])]) == {'green': 1, 'yellow': 1}
+    # A robot holding more than one waste still has one to transform, red robots one to dispose of
+    assert stranded_wastes([('green', ['green', 'green'])]) is None
+    assert stranded_wastes([('green', ['yellow'])]) is None
+    assert stranded_wastes([('red', ['red'])]) is None
+
+
+def test_robot_carrying_wastes_is_not_cleared():
+    # A green robot ends up with the 6 remaining greens
+    metrics = RadioactiveEnv(seed=1).run_model(400)
+    assert metrics['steps_to_clear'] is None
+    assert metrics['waste_remaining']['green'] == 6
+
+
+def test_stranded_waste_is_not_remaining():
+    # A yellow robot is left with a single yellow waste, nothing to transform it with
+    metrics = RadioactiveEnv(seed=8).run_model(400)
+    assert metrics['steps_to_clear'] is not None
+    assert metrics['waste_remaining'] == {'green': 0, 'yellow': 0, 'red': 0}
+    assert metrics['waste_stranded'] == {'green': 0, 'yellow': 1, 'red': 0}
+
+
+def test_announcements_on_the_same_cell_are_awarded_apart():
+    model = RadioactiveEnv(seed=0, initial_robots_per_zone=2)
+    green = next(robot for robot in model.schedule.get_agents_of_type(Robot) if robot.colour == 'green')
+    first, second = [robot.unique_id for robot in model.schedule.get_agents_of_type(Robot) if robot.colour == 'yellow']
+    # Two wastes dropped on the same cell, at steps 3 and 5, each robot wins one of them
+    green.receive_message(Message(first, green.unique_id, MessagePerformative.ACCEPT, (((6, 1), 3), (0, 1))))
+    green.receive_message(Message(second, green.unique_id, MessagePerformative.ACCEPT, (((6, 1), 3), (1, 1))))
+    green.receive_message(Message(second, green.unique_id, MessagePerformative.ACCEPT, (((6, 1), 5), (0, 1))))
+    green.receive_message(Message(first, green.unique_id, MessagePerformative.ACCEPT, (((6, 1), 5), (1, 1))))
+    model.handle_messages(green)
+    commits = sorted(
+        (message.get_dest(), message.get_content())
+        for message in model.message_service.get_pending_messages()
+        if message.get_performative() == MessagePerformative.COMMIT)
+    assert commits == sorted([(first, (6, 1)), (second, (6, 1))])
+
+
+def test_synchronous_mode_is_the_same_with_every_executor():
+    results = []
+    for executor in (None, 'thread', 'process'):
+        model = RadioactiveEnv(seed=5, step_mode='synchronous', deliberation_executor=executor, deliberation_workers=2)
+        results.append((model.run_model(150), model.datacollector.get_model_vars_dataframe().to_dict('list')))
+        model.close()
+    assert results[0] == results[1] == results[2]
+
+
+def test_synchronous_step_advances_the_clocks_once():
+    sequential = RadioactiveEnv(seed=5)
+    synchronous = RadioactiveEnv(seed=5, step_mode='synchronous')
+    for _ in range(10):
+        sequential.step()
+        synchronous.step()
+    assert synchronous.schedule.steps == sequential.schedule.steps == 10
+    assert synchronous.schedule.time == sequential.schedule.time == 10
+    assert synchronous._steps == sequential._steps
+    assert synchronous._time == sequential._time
+    sequential.close()
+    synchronous.close()
+
+
+def test_incremental_percepts_give_the_same_run():
+    full = RadioactiveEnv(seed=2)
+    incremental = RadioactiveEnv(seed=2, incremental_percepts=True)
+    assert incremental.run_model(200) == full.run_model(200)
+    assert (incremental.datacollector.get_model_vars_dataframe().to_dict('list')
+            == full.datacollector.get_model_vars_dataframe().to_dict('list'))
+
+
+def test_same_seed_same_run_whatever_the_hash_seed():
+    # Sets and dicts of the model must not make the run depend on the string hashes
+    code = ("import json; from robots.model import RadioactiveEnv; "
+            "model = RadioactiveEnv(seed=6, initial_robots_per_zone=2); "
+            "print(json.dumps(model.run_model(200)))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for hash_seed in ('0', '1', '2'):
+        env = dict(os.environ, PYTHONHASHSEED=hash_seed, PYTHONPATH=root)
+        output = subprocess.run([sys.executable, '-c', code], env=env, cwd=root, capture_output=True, text=True, check=True)
+        results.append(json.loads(output.stdout))
+    assert results[0] == results[1] == results[2]
+    assert results[0]['messages_sent'] > 0
+
+
+def test_unread_count_follows_the_mailboxes():
+    model = RadioactiveEnv(seed=3, initial_robots_per_zone=3)
+    robots = list(model.schedule.get_agents_of_type(Robot))
+    for _ in range(100):
+        model.step()
+        # Just after a dispatch, before the robots read the messages
+        model.message_service.dispatch_messages()
+        assert model.message_service.get_unread_count() == sum(robot.get_unread_count() for robot in robots)
+    assert model.message_service.get_statistics()['mailboxes']['received'] > 0
+    model.schedule.remove(robots[0])
+    assert model.message_service.get_unread_count() == sum(robot.get_unread_count() for robot in robots[1:])
+
+
+def test_models_side_by_side_keep_their_messages_apart(tmp_path):
+    alone = RadioactiveEnv(seed=7, initial_robots_per_zone=2).run_model(200)
+    first = RadioactiveEnv(seed=7, initial_robots_per_zone=2)
+    second = RadioactiveEnv(seed=8, initial_robots_per_zone=2, metrics_path=str(tmp_path / 'second'))
+    for _ in range(200):
+        first.step()
+        second.step()
+    for model in (first, second):
+        for robot in model.schedule.get_agents_of_type(Robot):
+            assert robot._CommunicatingAgent__messages_service is model.message_service
+    # Interleaving another model, streaming its metrics or not, doesn't change the run
+    assert first.run_model(0) == alone
+    assert second.run_model(0) == RadioactiveEnv(seed=8, initial_robots_per_zone=2).run_model(200)
+    assert first.get_metrics()['messages_sent'] == first.message_service.get_sent_count()
+    second.close()
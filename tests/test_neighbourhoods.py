@@ -0,0 +1,25 @@
+import mesa
+
+from robots.neighbourhoods import NeighbourhoodTable
+
+
+def test_table_matches_the_filtered_grid_neighbourhood():
+    width, height = 12, 5
+    grid = mesa.space.MultiGrid(width, height, torus=False)
+    table = NeighbourhoodTable(width, height)
+    for x_limit in (4, 8, 12):
+        for x in range(x_limit):
+            for y in range(height):
+                expected = [cell for cell in grid.get_neighborhood((x, y), True, True) if cell[0] < x_limit]
+                assert list(table.get((x, y), x_limit)) == expected
+
+
+def test_neighbourhoods_are_built_once():
+    table = NeighbourhoodTable(9, 3)
+    first = table.get((4, 1), 9)
+    assert table.get((4, 1), 6) is first
+    edge = table.get((5, 1), 6)
+    assert table.get((5, 1), 6) is edge
+    assert all(cell[0] < 6 for cell in edge)
+    # The cells are shared by the neighbourhoods containing them
+    assert next(cell for cell in first if cell == (5, 1)) is next(cell for cell in edge if cell == (5, 1))
@@ -0,0 +1,42 @@
+from robots.model import RadioactiveEnv
+from robots.profiling import StepProfiler
+
+
+def test_phase_totals_and_counts():
+    profiler = StepProfiler(enabled=True)
+    profiler.add('step', 30)
+    profiler.add('step', 10)
+    profiler.add('deliberate', 5, 'Robot')
+    with profiler.phase('deliberate', 'Robot'):
+        pass
+    profiler.count('messages_read', 3, 'Robot')
+    profiler.count('messages_read', 2, 'Robot')
+    calls, total, longest = profiler.timings['step', None]
+    assert (calls, total, longest) == (2, 40, 30)
+    assert profiler.timings['deliberate', 'Robot'][0] == 2
+    assert profiler.counters['messages_read', 'Robot'] == 5
+    profiler.end_step()
+    snapshot = profiler.snapshot()
+    assert snapshot['steps'] == 1
+    assert {'name': 'messages_read', 'agent_type': 'Robot', 'count': 5} in snapshot['counters']
+
+
+def test_disabled_profiler_records_nothing():
+    model = RadioactiveEnv(seed=1, initial_robots_per_zone=2)
+    model.run_model(100)
+    assert model.profiler.timings == {}
+    assert len(model.profiler.counters) == 0
+    assert model.profiler.steps == 0
+
+
+def test_enabled_profiler_records_the_model_phases():
+    model = RadioactiveEnv(seed=1, initial_robots_per_zone=2, profile=True)
+    model.run_model(100)
+    profiler = model.profiler
+    assert profiler.steps == 100
+    assert profiler.timings['schedule.step', None][0] == 100
+    for phase in ('update', 'deliberate', 'do', 'do.act', 'do.neighbourhood'):
+        assert profiler.timings[phase, 'Robot'][0] > 0
+    assert profiler.counters['action.PickUp', 'Robot'] > 0
+    service = model.message_service
+    assert profiler.counters['messages_read', 'Robot'] == service.get_delivered_count() - service.get_unread_count()
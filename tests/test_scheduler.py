@@ -0,0 +1,91 @@
+import mesa
+
+from robots.scheduler import RandomActivationByTypeFiltered
+
+
+class Active(mesa.Agent):
+    colour = 'green'
+
+    def __init__(self, unique_id, model):
+        super().__init__(unique_id, model)
+        self.steps = 0
+
+    def step(self):
+        self.steps += 1
+
+
+class Passive(Active):
+    colour = 'red'
+
+
+def test_agents_is_cached_until_the_schedule_changes():
+    model = mesa.Model()
+    schedule = RandomActivationByTypeFiltered(model, passive_types=(Passive,))
+    active = Active(1, model)
+    passive = Passive(2, model)
+    schedule.add(active)
+    schedule.add(passive)
+    agents = schedule.agents
+    assert schedule.agents is agents
+    assert set(agents) == {active, passive}
+
+    other = Active(3, model)
+    schedule.add(other)
+    assert set(schedule.agents) == {active, passive, other}
+    schedule.remove(passive)
+    assert set(schedule.agents) == {active, other}
+    schedule.set_passive(active)
+    assert set(schedule.agents) == {active, other}
+    assert schedule.get_agent_count() == 2
+
+
+def test_only_active_agents_are_stepped():
+    model = mesa.Model()
+    schedule = RandomActivationByTypeFiltered(model, passive_types=(Passive,))
+    active = [Active(unique_id, model) for unique_id in range(3)]
+    passive = [Passive(unique_id, model) for unique_id in range(3, 6)]
+    for agent in active + passive:
+        schedule.add(agent)
+    schedule.set_passive(active[0])
+    for _ in range(4):
+        schedule.step()
+    assert [agent.steps for agent in active] == [0, 4, 4]
+    assert [agent.steps for agent in passive] == [0, 0, 0]
+    # Passive agents are still counted and looked up
+    assert schedule.get_type_count(Passive) == 3
+    assert schedule.get_type_colour_count(Passive, 'red') == 3
+    assert set(schedule.get_agents_of_type(Active)) == set(active)
+    assert schedule.get_type_count(Active, lambda agent: agent.steps > 0) == 2
+
+    schedule.set_passive_type(Passive, False)
+    schedule.set_passive(active[0], False)
+    schedule.step()
+    assert [agent.steps for agent in active] == [1, 5, 5]
+    assert [agent.steps for agent in passive] == [1, 1, 1]
+    assert schedule.steps == 5
+
+
+def test_observers_see_additions_and_removals():
+    class Observer():
+        def __init__(self):
+            self.events = []
+
+        def agent_added(self, agent):
+            self.events.append(('added', agent.unique_id))
+
+        def agent_removed(self, agent):
+            self.events.append(('removed', agent.unique_id))
+
+    model = mesa.Model()
+    schedule = RandomActivationByTypeFiltered(model, passive_types=(Passive,))
+    observer = Observer()
+    schedule.add_observer(observer)
+    active = Active(1, model)
+    passive = Passive(2, model)
+    schedule.add(active)
+    schedule.add(passive)
+    schedule.remove(passive)
+    schedule.remove_observer(observer)
+    schedule.remove(active)
+    assert observer.events == [('added', 1), ('added', 2), ('removed', 2)]
+    assert schedule.get_type_count(Passive) == 0
@@ -0,0 +1,82 @@
+import numpy as np
+
+from robots.checkpoint import fork, restore, snapshot
+from robots.model import RadioactiveEnv
+from robots.trace import DEBUG, INFO, EventKind, EventTrace, filter_events, load_trace
+
+
+def test_ring_keeps_the_last_events():
+    trace = EventTrace(INFO, capacity=4)
+    for step in range(10):
+        trace.record(step, EventKind.MOVE, step % 3, (step, 0))
+    assert trace.head == 10
+    assert list(trace.ordered()['step']) == [6, 7, 8, 9]
+    assert list(trace.ordered(8)['step']) == [8, 9]
+    # Events already overwritten can't be returned
+    assert list(trace.ordered(2)['step']) == [6, 7, 8, 9]
+
+
+def test_spill_and_load(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    trace = EventTrace(INFO, capacity=4, path=path)
+    for step in range(11):
+        trace.record(step, EventKind.PICKUP, 7, (1, 2), step, 0)
+    trace.flush()
+    events = load_trace(path)
+    assert list(events['step']) == list(range(11))
+    assert list(events['a']) == list(range(11))
+    assert set(events['agent']) == {7}
+
+
+def test_filter_events():
+    trace = EventTrace(INFO, capacity=16)
+    for step in range(8):
+        kind = EventKind.MOVE if step % 2 else EventKind.DROP
+        trace.record(step, kind, step % 2, (0, 0))
+    events = trace.ordered()
+    assert list(filter_events(events, kinds=['drop'])['step']) == [0, 2, 4, 6]
+    assert list(filter_events(events, kinds=[EventKind.MOVE], agents=[1])['step']) == [1, 3, 5, 7]
+    assert list(filter_events(events, from_step=2, to_step=4)['step']) == [2, 3, 4]
+    assert len(filter_events(events, agents=[5])) == 0
+
+
+def test_restore_keeps_trace_monotonic(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    reference_path = str(tmp_path / 'reference.trace')
+    reference = RadioactiveEnv(seed=4, trace_level=DEBUG, trace_capacity=64, trace_path=reference_path)
+    for _ in range(40):
+        reference.step()
+    reference.close()
+
+    model = RadioactiveEnv(seed=4, trace_level=DEBUG, trace_capacity=64, trace_path=path)
+    for _ in range(20):
+        model.step()
+    data = snapshot(model)
+    # The original keeps spilling after the snapshot, then the process is interrupted
+    for _ in range(10):
+        model.step()
+    model.trace.flush()
+
+    resumed = restore(data)
+    for _ in range(20):
+        resumed.step()
+    resumed.close()
+
+    events = load_trace(path)
+    assert np.all(np.diff(events['step']) >= 0)
+    np.testing.assert_array_equal(events, load_trace(reference_path))
+
+
+def test_forks_dont_spill(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    model = RadioactiveEnv(seed=4, trace_level=DEBUG, trace_capacity=64, trace_path=path)
+    for _ in range(10):
+        model.step()
+    model.trace.flush()
+    size = len(load_trace(path))
+    for forked in fork(model, 2, seeds=[1, 2]):
+        assert forked.trace.path is None
+        for _ in range(10):
+            forked.step()
+        forked.close()
+    assert len(load_trace(path)) == size
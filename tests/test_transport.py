@@ -0,0 +1,90 @@
+from fractions import Fraction
+
+import pytest
+
+from robots.communication.message.Message import Message
+from robots.communication.message.MessagePerformative import MessagePerformative
+from robots.communication.transport.InMemoryTransport import InMemoryTransport
+from robots.communication.transport.MessageCodec import MessageCodec
+from robots.communication.transport.QueueTransport import QueueTransport
+from robots.communication.transport.SocketTransport import MessageBroker, SocketTransport
+from robots.communication.transport.Transport import Transport
+
+
+def message(sender, content):
+    return Message(sender, 'robots:red', MessagePerformative.PROPOSE, content)
+
+
+def contents(messages):
+    return [(message.get_exp(), message.get_content()) for message in messages]
+
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport()
+
+
+def test_in_memory_transport_delivers_after_flush():
+    transport = InMemoryTransport()
+    transport.send(message(1, 'a'))
+    assert transport.get_pending_count() == 1
+    assert transport.receive() == []
+    transport.flush()
+    transport.send(message(1, 'b'))
+    assert contents(transport.receive()) == [(1, 'a')]
+    assert contents(transport.get_pending_messages()) == [(1, 'b')]
+
+
+def test_codec_marshals_plain_contents():
+    codec = MessageCodec()
+    messages = [message(1, ((3, 4), 7)), Message(2, 5, MessagePerformative.COMMIT, (3, 4))]
+    data = codec.encode_batch(messages)
+    assert data[:1] == MessageCodec.MARSHAL
+    decoded = codec.decode_batch(data)
+    assert [(m.get_exp(), m.get_dest(), m.get_performative(), m.get_content()) for m in decoded] == \
+        [(1, 'robots:red', MessagePerformative.PROPOSE, ((3, 4), 7)), (2, 5, MessagePerformative.COMMIT, (3, 4))]
+
+
+def test_codec_falls_back_to_pickle():
+    codec = MessageCodec()
+    data = codec.encode_batch([message(1, Fraction(1, 3))])
+    assert data[:1] == MessageCodec.PICKLE
+    assert contents(codec.decode_batch(data)) == [(1, Fraction(1, 3))]
+    with pytest.raises(ValueError):
+        codec.decode_batch(b'X' + data[1:])
+
+
+def test_queue_transports_step_in_lock_step():
+    first, second = QueueTransport.create_group(2, timeout=5)
+    try:
+        first.send(message(1, 'a'))
+        first.flush()
+        second.send(message(2, 'b'))
+        second.flush()
+        assert contents(first.receive()) == [(1, 'a'), (2, 'b')]
+        # The first endpoint is one flush ahead, its batch waits for the next receive of the second
+        first.send(message(1, 'c'))
+        first.flush()
+        assert contents(second.receive()) == [(1, 'a'), (2, 'b')]
+        second.flush()
+        assert contents(second.receive()) == [(1, 'c')]
+        assert contents(first.receive()) == [(1, 'c')]
+    finally:
+        first.close()
+        second.close()
+
+
+def test_socket_transports_relay_through_the_broker():
+    broker = MessageBroker(2)
+    # Connected out of order, the broker relays in index order
+    second = SocketTransport(broker.get_address(), index=1)
+    first = SocketTransport(broker.get_address(), index=0)
+    first.send(message(1, 'a'))
+    second.send(message(2, 'b'))
+    second.flush()
+    first.flush()
+    assert contents(first.receive()) == [(1, 'a'), (2, 'b')]
+    assert contents(second.receive()) == [(1, 'a'), (2, 'b')]
+    first.close()
+    second.close()
+    broker.join(5)
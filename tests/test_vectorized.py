@@ -0,0 +1,54 @@
+import numpy as np
+
+from robots.beliefs import WasteBeliefs
+from robots.vectorized import _Announcements
+
+
+def test_announcements_follow_the_waste_beliefs():
+    announcements = _Announcements(np.array([3, 5]), 6, width=30, height=10)
+    beliefs = WasteBeliefs()
+    for x, y in [(12, 4), (18, 1), (12, 4), (15, 9)]:
+        announcements.append(x, y, 3)
+        beliefs.add((x, y))
+    announcements.append(18, 1, 5)
+    assert announcements.pending.tolist() == [len(beliefs), 1]
+
+    robots = np.array([3, 5])
+    x, y, has_target = announcements.nearest(robots, np.array([16, 0]), np.array([5, 0]))
+    assert has_target.tolist() == [True, True]
+    assert (x[0], y[0]) == beliefs.nearest((16, 5))
+    assert (x[1], y[1]) == (18, 1)
+
+    # Robot 3 finds no waste on (18, 1), robot 5 still believes in it
+    announcements.evict(np.array([3]), np.array([18]), np.array([1]))
+    beliefs.observe((18, 1), False)
+    x, y, has_target = announcements.nearest(robots, np.array([18, 0]), np.array([1, 0]))
+    assert (x[0], y[0]) == beliefs.nearest((18, 1))
+    assert (x[1], y[1]) == (18, 1)
+    assert announcements.pending.tolist() == [len(beliefs), 1]
+
+
+def test_announcements_only_keep_known_locations():
+    announcements = _Announcements(np.array([0]), 1, width=30, height=10)
+    for step in range(100):
+        announcements.append(step % 30, step % 10, 0)
+        announcements.evict(np.array([0]), np.array([step % 30]), np.array([step % 10]))
+    assert announcements.count == 0
+    assert len(announcements.owner) == 16
+    assert announcements.pending.tolist() == [0]
+
+
+def test_announcements_scale_with_the_locations():
+    # Many robots, few awarded locations: only the entries are visited
+    robots = np.arange(0, 20000, 2)
+    announcements = _Announcements(robots, 20000, width=100, height=100)
+    announcements.append(40, 40, 2)
+    announcements.append(60, 10, 2)
+    announcements.append(60, 10, 4)
+    x = np.full(len(robots), 50)
+    y = np.full(len(robots), 20)
+    target_x, target_y, has_target = announcements.nearest(robots, x, y)
+    assert np.flatnonzero(has_target).tolist() == [1, 2]
+    assert (target_x[1], target_y[1]) == (60, 10)
+    assert (target_x[0], target_y[0]) == (50, 20)
+    assert announcements.count == 3
@@ -0,0 +1,88 @@
+import random
+
+from robots.agents import Waste
+from robots.beliefs import LINEAR_SCAN, WasteBeliefs, distance
+from robots.model import RadioactiveEnv
+from robots.waste_index import WasteIndex
+
+
+class Item():
+    def __init__(self, colour):
+        self.colour = colour
+
+
+def brute_force_nearest(cells, pos, radius, x_limit=None, exclude_x=None):
+    candidates = [
+        (distance(pos, cell), cell) for cell in cells
+        if distance(pos, cell) <= radius
+        and (x_limit is None or cell[0] < x_limit) and (exclude_x is None or cell[0] != exclude_x)
+    ]
+    return min(candidates)[1] if candidates else None
+
+
+def test_index_nearest_matches_brute_force():
+    rng = random.Random(0)
+    for wastes in (3, 400):
+        index = WasteIndex()
+        cells = set()
+        for _ in range(wastes):
+            cell = (rng.randrange(30), rng.randrange(20))
+            index.add(Item('green'), cell)
+            cells.add(cell)
+        for _ in range(200):
+            pos = (rng.randrange(30), rng.randrange(20))
+            radius = rng.choice([1, 2, 5])
+            assert index.nearest(pos, 'green', radius) == brute_force_nearest(cells, pos, radius)
+            assert index.nearest(pos, 'green', radius, x_limit=10, exclude_x=9) \
+                == brute_force_nearest(cells, pos, radius, x_limit=10, exclude_x=9)
+        assert index.nearest((0, 0), 'red', 5) is None
+
+
+def test_index_add_and_remove():
+    index = WasteIndex()
+    first, second = Item('yellow'), Item('yellow')
+    index.add(first, (2, 3))
+    index.add(second, (2, 3))
+    assert index.count('yellow') == 2
+    assert list(index.wastes_at((2, 3), 'yellow')) == [first, second]
+    index.remove(first, (2, 3))
+    assert index.has_waste((2, 3), 'yellow')
+    index.remove(second, (2, 3))
+    assert not index.has_waste((2, 3), 'yellow')
+    assert list(index.positions('yellow')) == []
+
+
+def test_model_index_follows_the_grid():
+    model = RadioactiveEnv(seed=1, initial_robots_per_zone=2)
+    for _ in range(150):
+        model.step()
+        on_grid = {}
+        for contents, pos in model.grid.coord_iter():
+            for agent in contents:
+                if isinstance(agent, Waste):
+                    on_grid.setdefault(agent.colour, set()).add((agent.unique_id, pos))
+        for colour in ('green', 'yellow', 'red'):
+            indexed = {(waste.unique_id, pos)
+                       for pos in model.waste_index.positions(colour)
+                       for waste in model.waste_index.wastes_at(pos, colour)}
+            assert indexed == on_grid.get(colour, set())
+
+
+def test_beliefs_nearest_matches_brute_force():
+    rng = random.Random(1)
+    beliefs = WasteBeliefs(bucket_size=4)
+    locations = set()
+    for _ in range(LINEAR_SCAN * 4):
+        location = (rng.randrange(60), rng.randrange(40))
+        beliefs.add(location)
+        locations.add(location)
+    for _ in range(300):
+        pos = (rng.randrange(-5, 65), rng.randrange(-5, 45))
+        assert beliefs.nearest(pos) == min(locations, key=lambda location: (distance(pos, location), location))
+        # Evicting keeps the buckets in step with the locations
+        if rng.random() < 0.3:
+            location = rng.choice(sorted(locations))
+            assert beliefs.observe(location, False)
+            locations.discard(location)
+    assert len(beliefs) == len(locations)
+    assert WasteBeliefs().nearest((0, 0)) is None
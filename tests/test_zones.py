@@ -0,0 +1,37 @@
+import numpy as np
+
+from robots.agents import Robot, Waste
+from robots.model import RadioactiveEnv
+from robots.server import ZoneCanvasGrid, wolf_sheep_portrayal
+from robots.zones import ZONE_COLOURS, ZoneRaster
+
+
+def test_raster_stores_one_byte_per_cell():
+    raster = ZoneRaster(9, 2, {'green': (0, 3), 'yellow': (3, 6), 'red': (6, 9)})
+    assert raster.codes.shape == (9, 2)
+    assert raster.codes.dtype == np.uint8
+    assert [raster.get_zone((x, 1)) for x in range(9)] == ['green'] * 3 + ['yellow'] * 3 + ['red'] * 3
+    assert raster[5, 0] == 'yellow'
+
+
+def test_model_zones_without_tile_agents():
+    model = RadioactiveEnv(seed=0)
+    for colour, (x_min, x_max) in model.zone_locations.items():
+        assert model.get_zone((x_min, 0)) == colour
+        assert model.get_zone((x_max - 1, model.height - 1)) == colour
+    # Only robots and wastes are on the grid
+    assert {type(agent) for contents, _ in model.grid.coord_iter() for agent in contents} == {Robot, Waste}
+
+
+def test_canvas_draws_a_tile_per_cell_under_the_agents():
+    model = RadioactiveEnv(seed=0)
+    canvas = ZoneCanvasGrid(wolf_sheep_portrayal, model.width, model.height, 500, 125)
+    state = canvas.render(model)
+    tiles = state[0]
+    assert len(tiles) == model.width * model.height
+    assert {(tile['x'], tile['y']) for tile in tiles} == {(x, y) for x in range(model.width) for y in range(model.height)}
+    for tile in tiles:
+        assert tile['Shape'] == f"robots/resources/tile_{model.get_zone((tile['x'], tile['y']))}.png"
+    assert set(ZONE_COLOURS) == {model.get_zone((tile['x'], tile['y'])) for tile in tiles}
+    assert len(state[1]) == len(list(model.schedule.get_agents_of_type(Waste)))
+    assert len(state[2]) == len(list(model.schedule.get_agents_of_type(Robot)))